@@ -0,0 +1,527 @@
+#!/usr/bin/env -S uv run --script
+# /// script
+# requires-python = ">=3.12"
+# dependencies = ["pdf2image", "pillow"]
+# ///
+
+"""
+Slide Viewer Benchmark
+
+Generates a synthetic corpus of PDF decks and measures the stages of
+slideview.py on it: rendering, thumbnailing, encoding, packing thumbnails
+into sprite atlases and HTML generation.
+Every stage runs in a fresh process, so the peak RSS reported for a stage is
+its own. Results are appended as JSON lines, one record per run, and can be
+compared against the previous run with the same settings.
+
+Usage:
+    python slidebench.py                                    # 10 decks x 30 pages
+    python slidebench.py --decks 40 --pages 60 --density 4 --photos 2
+    python slidebench.py --format webp --page-size a4 --compare
+    python slidebench.py --stages render,encode --fail-on-regression
+    python slidebench.py --stages render --renderer pdfium  # pages/s against the pdftoppm default
+    python slidebench.py --page-size mixed --width 1920     # per-page resolution on mixed sizes
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import base64
+import random
+import argparse
+import platform
+import resource
+import contextlib
+import tempfile
+import subprocess
+import multiprocessing
+from datetime import datetime, timezone
+from pathlib import Path
+
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from slideview import PDFSlideViewer, IMAGE_FORMATS, RENDERERS  # noqa: E402
+
+STAGES = ('render', 'thumbnail', 'encode', 'sprites', 'html')
+
+# Page sizes in PDF points
+PAGE_SIZES = {
+    '16:9': (960, 540),
+    '4:3': (720, 540),
+    'a4': (595, 842),
+    'a3': (842, 1191),
+    'a1': (1684, 2384),
+}
+
+# Vocabulary for the generated slide text, roughly what the conference decks talk about
+WORDS = """
+    Bibliothek Bibliotheken Digitalisierung Forschungsdaten Infrastruktur Erschließung Katalog
+    Metadaten Nutzerinnen Nutzer Open Access Publikation Zeitschriften Lizenzen Künstliche Intelligenz
+    Sprachmodelle Chatbot Beratung Schulung Kompetenz Strategie Projekt Ergebnisse Evaluation
+    Bestand Sammlung Archiv Langzeitarchivierung Repositorium Discovery Suche Recherche Daten
+    Zukunft Zusammenarbeit Netzwerk Hochschule Universität Lernort Vermittlung Fragen Diskussion
+""".split()
+
+
+class PDFWriter:
+    """Just enough PDF 1.4 to write vector slides with text, shapes and images"""
+
+    def __init__(self):
+        self.objects = []
+
+    def add(self, body):
+        self.objects.append(body)
+        return len(self.objects)
+
+    def stream(self, data, keys=b""):
+        return self.add(b"<< /Length %d%s >>\nstream\n" % (len(data), keys) + data + b"\nendstream")
+
+    def save(self, path, root):
+        out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, body in enumerate(self.objects, start=1):
+            offsets.append(len(out))
+            out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+        xref = len(out)
+        out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(self.objects) + 1)
+        for offset in offsets:
+            out += b"%010d 00000 n \n" % offset
+        out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+            len(self.objects) + 1, root, xref)
+        Path(path).write_bytes(out)
+
+
+def pdf_text(text):
+    """Encode text as a PDF string literal for the WinAnsi-encoded standard fonts"""
+    escaped = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    return b"(" + escaped.encode('cp1252', errors='replace') + b")"
+
+
+def generate_deck(path, pages, page_size, density, photos, seed):
+    """Write a synthetic deck and return the text of each page
+
+    density scales the number of text lines and shapes per page; photos
+    adds that many noise images per page, the worst case for lossless
+    encoders. With page_size 'mixed' every page gets one of PAGE_SIZES at
+    random, like a corpus of slides, handouts and posters.
+    """
+    rng = random.Random(seed)
+    pdf = PDFWriter()
+    font = pdf.add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    pages_number = pdf.add(b"")  # filled in once the page objects exist
+    kids = []
+    texts = []
+
+    for page_number in range(1, pages + 1):
+        width, height = rng.choice(list(PAGE_SIZES.values())) if page_size == 'mixed' else page_size
+        title = f"{Path(path).stem} {' '.join(rng.choice(WORDS) for _ in range(3))} {page_number}"
+        content = [b"0.0 0.35 0.63 rg 0 %d %d 70 re f" % (height - 70, width),
+                   b"BT /F1 26 Tf 1 1 1 rg 36 %d Td " % (height - 46) + pdf_text(title) + b" Tj ET"]
+        lines = [title]
+
+        y = height - 110
+        for _ in range(4 * density):
+            if y < 40:
+                break
+            line = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(4, 9)))
+            content.append(b"BT /F1 15 Tf 0.1 0.1 0.1 rg 48 %d Td " % y + pdf_text(line) + b" Tj ET")
+            lines.append(line)
+            y -= 22
+
+        for _ in range(2 * density):
+            x, y = rng.randrange(width // 2, width - 60), rng.randrange(40, height - 160)
+            w, h = rng.randrange(20, 160), rng.randrange(20, 120)
+            r, g, b = rng.random(), rng.random(), rng.random()
+            content.append(b"%.2f %.2f %.2f rg %d %d %d %d re f" % (r, g, b, x, y, w, h))
+
+        xobjects = []
+        for k in range(photos):
+            w, h = 240, 160
+            image = pdf.stream(zlib.compress(rng.randbytes(w * h * 3)),
+                               b" /Type /XObject /Subtype /Image /Width %d /Height %d"
+                               b" /ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode" % (w, h))
+            xobjects.append(b"/Im%d %d 0 R" % (k, image))
+            x, y = rng.randrange(0, width - w), rng.randrange(0, height - h - 70)
+            content.append(b"q %d 0 0 %d %d %d cm /Im%d Do Q" % (w, h, x, y, k))
+
+        contents = pdf.stream(zlib.compress(b"\n".join(content)), b" /Filter /FlateDecode")
+        resources = b"<< /Font << /F1 %d 0 R >> /XObject << %s >> >>" % (font, b" ".join(xobjects))
+        kids.append(pdf.add(b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R /Resources %s >>"
+                            % (pages_number, width, height, contents, resources)))
+        texts.append(' '.join(lines))
+
+    pdf.objects[pages_number - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids), len(kids))
+    pdf.save(path, pdf.add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_number))
+    return texts
+
+
+def generate_corpus(corpus_dir, config):
+    """Generate the synthetic corpus unless one with the same parameters exists"""
+    corpus_dir = Path(corpus_dir)
+    params = {key: config[key] for key in ('decks', 'pages', 'page_size', 'density', 'photos', 'seed')}
+    info_path = corpus_dir / "corpus.json"
+    if info_path.exists() and json.loads(info_path.read_text())['params'] == params:
+        return
+
+    corpus_dir.mkdir(parents=True, exist_ok=True)
+    for stale in corpus_dir.glob('*.pdf'):
+        stale.unlink()
+
+    print(f"Generating {config['decks']} decks of {config['pages']} pages in {corpus_dir}/")
+    texts = {}
+    for number in range(config['decks']):
+        deck = corpus_dir / f"deck_{number:03d}.pdf"
+        texts[deck.stem] = generate_deck(deck, config['pages'], config['page_size'], config['density'],
+                                         config['photos'], seed=config['seed'] * 1000 + number)
+    info_path.write_text(json.dumps({'params': params, 'texts': texts}))
+
+
+class StageTimer:
+    """Accumulates wall and CPU time (including child processes) of timed sections"""
+
+    def __init__(self):
+        self.wall = 0.0
+        self.cpu = 0.0
+
+    def __enter__(self):
+        self._wall = time.perf_counter()
+        self._times = os.times()
+        return self
+
+    def __exit__(self, *exc):
+        end = os.times()
+        self.wall += time.perf_counter() - self._wall
+        self.cpu += sum(end[i] - self._times[i] for i in range(4))  # user, system, children user/system
+
+
+def make_viewer(config, output_dir):
+    return PDFSlideViewer(
+        output_dir=output_dir,
+        thumbnail_size=tuple(config['thumbnail_size']),
+        quality=config['quality'],
+        single_file=config['single_file'],
+        stream=config['stream'],
+        dpi=config['dpi'],
+        use_cache=False,
+        image_format=config['format'],
+        lazy=config['lazy'],
+        extract_text=False,
+        renderer=config['renderer'],
+        render_threads=config['render_threads'],
+        width=config['width'],
+    )
+
+
+def page_files(scratch, kind):
+    return sorted((Path(scratch) / kind).glob('*.ppm'))
+
+
+def run_render(config, corpus_dir, scratch, timer):
+    """Render every page and keep it as PPM for the later stages
+
+    The time of writing the PPM files is taken out again, but the pdfium
+    renderer works ahead while they are written, as it would while pages
+    are being encoded in a real build.
+    """
+    viewer = make_viewer(config, scratch)
+    (scratch / "pages").mkdir(exist_ok=True)
+    saving = StageTimer()
+    output_bytes = count = 0
+    for deck in sorted(Path(corpus_dir).glob('*.pdf')):
+        with timer:
+            for page_number, page in viewer.iter_pages(deck):
+                with saving:
+                    page.save(scratch / "pages" / f"{deck.stem}_{page_number:03d}.ppm")
+                output_bytes += page.width * page.height * len(page.getbands())
+                count += 1
+    timer.wall -= saving.wall
+    timer.cpu -= saving.cpu
+    return output_bytes, count, count
+
+
+def run_thumbnail(config, corpus_dir, scratch, timer):
+    """Shrink the rendered pages, or with --width render thumbnails directly"""
+    (scratch / "thumbs").mkdir(exist_ok=True)
+    output_bytes = count = 0
+    if config['width']:
+        viewer = make_viewer(config, scratch)
+        for deck in sorted(Path(corpus_dir).glob('*.pdf')):
+            with timer:
+                thumbnails = [(page_number, viewer.make_thumbnail(image))
+                              for page_number, image in viewer.iter_thumbnails(deck)]
+            for page_number, thumbnail in thumbnails:
+                thumbnail.save(scratch / "thumbs" / f"{deck.stem}_{page_number:03d}.ppm")
+                output_bytes += thumbnail.width * thumbnail.height * len(thumbnail.getbands())
+                count += 1
+        return output_bytes, count, count
+
+    for path in page_files(scratch, "pages"):
+        with Image.open(path) as page:
+            page.load()
+            with timer:
+                thumbnail = page.copy()
+                thumbnail.thumbnail(tuple(config['thumbnail_size']), Image.Resampling.LANCZOS)
+        thumbnail.save(scratch / "thumbs" / path.name)
+        output_bytes += thumbnail.width * thumbnail.height * len(thumbnail.getbands())
+        count += 1
+    return output_bytes, count, count
+
+
+def run_encode(config, corpus_dir, scratch, timer):
+    viewer = make_viewer(config, scratch)
+    (scratch / "encoded").mkdir(exist_ok=True)
+    output_bytes = count = 0
+    for kind in ("pages", "thumbs"):
+        for path in page_files(scratch, kind):
+            with Image.open(path) as image:
+                image.load()
+                with timer:
+                    data, fmt = viewer.encode_image(image)
+            (scratch / "encoded" / f"{path.stem}_{kind}{IMAGE_FORMATS[fmt][0]}").write_bytes(data)
+            output_bytes += len(data)
+            count += kind == "pages"
+    return output_bytes, count, 2 * count
+
+
+def run_sprites(config, corpus_dir, scratch, timer):
+    """Pack the thumbnails of every deck into atlases, as --sprites does
+
+    Compare its files and output bytes with the thumbnail half of the
+    encode stage, which writes one file per slide.
+    """
+    viewer = make_viewer(config, scratch / "sprites")
+    viewer.setup_directories()
+    decks = {}
+    for path in page_files(scratch, "thumbs"):
+        deck, page_number = path.stem.rsplit('_', 1)
+        decks.setdefault(deck, []).append((int(page_number), path))
+
+    count = 0
+    for deck, pages in decks.items():
+        slides, tiles = [], []
+        for page_number, path in pages:
+            with Image.open(path) as tile:
+                tiles.append(tile.copy())
+            slides.append({'page': page_number})
+        with timer:
+            viewer.write_sprites(deck, slides, tiles)
+        count += len(slides)
+    atlases = list((scratch / "sprites" / "thumbnails").iterdir())
+    return sum(path.stat().st_size for path in atlases), count, len(atlases)
+
+
+def run_html(config, corpus_dir, scratch, timer):
+    viewer = make_viewer(config, scratch / "viewer")
+    viewer.setup_directories()
+    texts = json.loads((Path(corpus_dir) / "corpus.json").read_text())['texts']
+
+    encoded = {path.stem: path for path in (scratch / "encoded").iterdir()}
+    for path in page_files(scratch, "pages"):
+        deck, page_number = path.stem.rsplit('_', 1)
+        page_number = int(page_number)
+        image, thumbnail = encoded[f"{path.stem}_pages"], encoded[f"{path.stem}_thumbs"]
+        if config['single_file']:
+            image_ref = viewer_data_uri(image)
+            thumb_ref = viewer_data_uri(thumbnail)
+        else:
+            image_ref, thumb_ref = f"images/{image.name}", f"thumbnails/{thumbnail.name}"
+        viewer.slides_data.append({
+            'presentation': deck,
+            'page': page_number,
+            'image': image_ref,
+            'thumbnail': thumb_ref,
+            'id': f"{deck}_page_{page_number}",
+            'text': texts[deck][page_number - 1],
+        })
+
+    with timer, contextlib.redirect_stdout(open(os.devnull, 'w')):
+        viewer.generate_html_viewer()
+    files = [path for path in (scratch / "viewer").rglob('*') if path.is_file() and path.suffix in ('.html', '.js')]
+    return sum(path.stat().st_size for path in files), len(viewer.slides_data), len(files)
+
+
+def viewer_data_uri(path):
+    mime = next(mime for ext, mime in IMAGE_FORMATS.values() if ext == path.suffix)
+    return f"data:{mime};base64,{base64.b64encode(path.read_bytes()).decode('ascii')}"
+
+
+STAGE_RUNNERS = {
+    'render': run_render,
+    'thumbnail': run_thumbnail,
+    'encode': run_encode,
+    'sprites': run_sprites,
+    'html': run_html,
+}
+
+
+def stage_worker(stage, config, corpus_dir, scratch):
+    """Run one stage in the current (fresh) process and return its measurements"""
+    timer = StageTimer()
+    output_bytes, pages, files = STAGE_RUNNERS[stage](config, Path(corpus_dir), Path(scratch), timer)
+    # ru_maxrss is in KB on Linux; pdftoppm shows up under RUSAGE_CHILDREN
+    peak_kb = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return {
+        'wall_s': round(timer.wall, 4),
+        'cpu_s': round(timer.cpu, 4),
+        'peak_rss_mb': round(peak_kb / 1024, 1),
+        'output_bytes': output_bytes,
+        'files': files,
+        'pages': pages,
+    }
+
+
+def run_stage(stage, config, corpus_dir, scratch):
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1) as pool:
+        return pool.apply(stage_worker, (stage, config, str(corpus_dir), str(scratch)))
+
+
+def git_revision():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=Path(__file__).resolve().parent, check=True)
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(record):
+    print(f"\n{'stage':<10} {'wall s':>8} {'cpu s':>8} {'peak MB':>8} {'output MB':>10} {'files':>7} {'pages/s':>8}")
+    for stage, result in record['stages'].items():
+        rate = result['pages'] / result['wall_s'] if result['wall_s'] else 0
+        print(f"{stage:<10} {result['wall_s']:>8.2f} {result['cpu_s']:>8.2f} {result['peak_rss_mb']:>8.1f} "
+              f"{result['output_bytes'] / (1024 * 1024):>10.2f} {result['files']:>7} {rate:>8.1f}")
+
+
+def compare_results(record, results_path, threshold):
+    """Compare against the previous run with the same config; return the regressed metrics"""
+    previous = None
+    if results_path.exists():
+        for line in results_path.read_text().splitlines():
+            entry = json.loads(line)
+            if entry['config'] == record['config']:
+                previous = entry
+    if previous is None:
+        print("\nNo earlier run with the same settings to compare against")
+        return []
+
+    print(f"\nCompared to {previous['time']} ({previous.get('revision') or 'unknown revision'}):")
+    regressions = []
+    for stage, result in record['stages'].items():
+        before = previous['stages'].get(stage)
+        if not before:
+            continue
+        for metric in ('wall_s', 'cpu_s', 'peak_rss_mb', 'output_bytes'):
+            old, new = before[metric], result[metric]
+            change = 100 * (new - old) / old if old else 0
+            marker = ""
+            if change > threshold:
+                marker = "  <- regression"
+                regressions.append(f"{stage}.{metric}")
+            print(f"  {stage:<10} {metric:<13} {old:>12} -> {new:<12} {change:+6.1f}%{marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark slideview.py stages on a synthetic PDF corpus')
+    parser.add_argument('--decks', type=int, default=10, help='Number of decks (default: 10)')
+    parser.add_argument('--pages', type=int, default=30, help='Pages per deck (default: 30)')
+    parser.add_argument('--page-size', default='16:9',
+                        help=f"One of {', '.join(PAGE_SIZES)}, mixed (a random one per page) or WIDTHxHEIGHT in points (default: 16:9)")
+    parser.add_argument('--density', type=int, default=2, help='Content density: text lines and shapes per page scale with it (default: 2)')
+    parser.add_argument('--photos', type=int, default=1, help='Noise images per page (default: 1)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed of the corpus (default: 1)')
+    parser.add_argument('--corpus', default='bench-corpus', help='Directory of the generated corpus (default: bench-corpus)')
+    parser.add_argument('--stages', default=','.join(STAGES), help=f"Comma-separated stages to run (default: {','.join(STAGES)})")
+    parser.add_argument('--format', choices=[*IMAGE_FORMATS, 'auto'], default='png', help='Image format (default: png)')
+    parser.add_argument('--quality', type=int, default=85, help='Image quality 1-100 for lossy formats (default: 85)')
+    parser.add_argument('--dpi', type=int, default=150, help='Render resolution (default: 150)')
+    parser.add_argument('--width', type=int, help='Render pages this many pixels wide and thumbnails directly, like slideview --width')
+    parser.add_argument('--thumbnail-size', default='300x200', help='Thumbnail size as WIDTHxHEIGHT (default: 300x200)')
+    parser.add_argument('--stream', action='store_true', help='Render with --stream')
+    parser.add_argument('--renderer', choices=RENDERERS, default='pdftoppm', help='Page renderer (default: pdftoppm)')
+    parser.add_argument('--render-threads', type=int, default=2, help='Look-ahead of the pdfium renderer (default: 2)')
+    parser.add_argument('--single-file', action='store_true', help='Generate the single-file viewer')
+    parser.add_argument('--lazy', action='store_true', help='Generate the lazy viewer')
+    parser.add_argument('--results', default='bench.jsonl', help='JSON lines file the results are appended to (default: bench.jsonl)')
+    parser.add_argument('--compare', action='store_true', help='Compare with the previous run that used the same settings')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Percent increase reported as a regression (default: 10)')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 if a regression is found')
+    args = parser.parse_args()
+
+    try:
+        if args.page_size == 'mixed':
+            page_size = 'mixed'
+        else:
+            page_size = list(PAGE_SIZES.get(args.page_size) or map(int, args.page_size.split('x')))
+        thumbnail_size = tuple(map(int, args.thumbnail_size.split('x')))
+    except ValueError:
+        print("Error: sizes must be given as WIDTHxHEIGHT")
+        sys.exit(1)
+
+    stages = [stage for stage in args.stages.split(',') if stage]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        print(f"Error: unknown stages: {', '.join(sorted(unknown))}")
+        sys.exit(1)
+
+    config = {
+        'decks': args.decks,
+        'pages': args.pages,
+        'page_size': page_size,
+        'density': args.density,
+        'photos': args.photos,
+        'seed': args.seed,
+        'format': args.format,
+        'quality': args.quality,
+        'dpi': args.dpi,
+        'width': args.width,
+        'thumbnail_size': list(thumbnail_size),
+        'stream': args.stream,
+        'renderer': args.renderer,
+        'render_threads': args.render_threads,
+        'single_file': args.single_file,
+        'lazy': args.lazy,
+    }
+    generate_corpus(args.corpus, config)
+
+    record = {
+        'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'config': config,
+        'stages': {},  # only the stages that were asked for
+    }
+
+    # Later stages read what the earlier ones left in the scratch directory
+    with tempfile.TemporaryDirectory(prefix="slidebench-") as scratch:
+        for stage in STAGES:
+            needed = stage in stages or any(STAGES.index(s) > STAGES.index(stage) for s in stages)
+            if not needed:
+                continue
+            print(f"Running {stage}...")
+            result = run_stage(stage, config, args.corpus, scratch)
+            if stage in stages:
+                record['stages'][stage] = result
+
+    print_results(record)
+
+    results_path = Path(args.results)
+    regressions = compare_results(record, results_path, args.threshold) if args.compare else []
+    with open(results_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"\nResults appended to {results_path}")
+
+    if regressions and args.fail_on_regression:
+        print(f"Regressions: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
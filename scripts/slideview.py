@@ -1,7 +1,7 @@
 #!/usr/bin/env -S uv run --script
 # /// script
 # requires-python = ">=3.12"
-# dependencies = ["pdf2image", "pillow"]
+# dependencies = ["pdf2image", "pillow", "aiohttp", "pypdfium2"]
 # ///
 
 
@@ -14,155 +14,133 @@ for quickly browsing through all slides.
 
 Requirements:
     pip install pdf2image pillow
+    pip install aiohttp    # only for --fetch
+    pip install pypdfium2  # only for --renderer pdfium
 
 Usage:
     python pdf_viewer.py /path/to/pdfs/
     python pdf_viewer.py file1.pdf file2.pdf file3.pdf
     python pdf_viewer.py --single-file presentation.pdf  # Creates self-contained HTML
+    python pdf_viewer.py --jobs 16 /path/to/pdfs/        # Render on 16 processes
+    python pdf_viewer.py --stream long-deck.pdf          # Bounded memory per deck
+    python pdf_viewer.py --width 1920 /path/to/pdfs/     # 1920 px wide pages, whatever their size
+    python pdf_viewer.py --srcset 640,1280 /path/to/pdfs/  # Smaller copies for small screens
+    python pdf_viewer.py --preview /path/to/pdfs/        # Quick low-res viewer first, then full quality
+    python pdf_viewer.py --dedup --dedup-distance 8 /path/to/pdfs/  # Store repeated slides once
+    python pdf_viewer.py --renderer pdfium /path/to/pdfs/  # Render in-process (pip install pypdfium2)
+    python pdf_viewer.py --timeout 120 --memory-limit 4096 /path/to/pdfs/  # Quarantine PDFs over the limits
+    python pdf_viewer.py --profile /path/to/pdfs/        # Per-stage timings and OUTPUT/trace.json
+    python pdf_viewer.py --profile --trace run.json /path/to/pdfs/  # ... with the trace written to run.json
+    python pdf_viewer.py --watch /path/to/pdfs/          # Rebuild as decks are added or changed
+    python pdf_viewer.py --serve /path/to/pdfs/          # Render on demand at http://127.0.0.1:8000/
+    python pdf_viewer.py --shard 2/4 -o part2 /path/to/pdfs/  # One of four machines
+    python pdf_viewer.py --merge part1 part2 part3 part4 -o site
+    python pdf_viewer.py --query "künstliche intelligenz" -o site  # Slides mentioning it, from catalog.sqlite
+    python pdf_viewer.py --fetch ../data/opus4-bib-info-2025-pdf.txt --download-dir ../data
+
+Library use, pages as they are rendered and without writing a viewer:
+    viewer = PDFSlideViewer(dpi=100)
+    for record in viewer.iter_slides("deck.pdf"):  # or: async for ... in viewer.aiter_slides(...)
+        ingest(record['page'], record['image'], record['thumbnail'], record['text'])
 """
 
 import os
+import queue
+import re
 import sys
+import select
+import shutil
+import struct
+import math
 import argparse
+import asyncio
+import bisect
+import contextlib
+import ctypes
+import errno
+import functools
+import hashlib
+import itertools
+import multiprocessing
+import multiprocessing.connection
+import signal
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+import unicodedata
+import urllib.parse
+import zlib
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
-from pdf2image import convert_from_path
-from PIL import Image
+from pdf2image import convert_from_path, pdfinfo_from_path
+from pdf2image.exceptions import PDFPageCountError, PDFSyntaxError
+from PIL import Image, ImageChops, ImageStat, features
 import json
 import base64
-from io import BytesIO
-
-class PDFSlideViewer:
-    def __init__(self, output_dir="slide_viewer", thumbnail_size=(300, 200), quality=85, single_file=False):
-        self.output_dir = Path(output_dir)
-        self.thumbnail_size = thumbnail_size
-        self.quality = quality
-        self.single_file = single_file
-        self.slides_data = []
-
-    def setup_directories(self):
-        """Create necessary directories"""
-        self.output_dir.mkdir(exist_ok=True)
-        if not self.single_file:
-            (self.output_dir / "images").mkdir(exist_ok=True)
-            (self.output_dir / "thumbnails").mkdir(exist_ok=True)
-
-    def image_to_base64(self, image, format="PNG"):
-        """Convert PIL Image to base64 data URI"""
-        buffer = BytesIO()
-        image.save(buffer, format=format, quality=self.quality, optimize=True)
-        img_data = buffer.getvalue()
-        img_base64 = base64.b64encode(img_data).decode('utf-8')
-        return f"data:image/{format.lower()};base64,{img_base64}"
-
-    def convert_pdf_to_images(self, pdf_path):
-        """Convert a single PDF to images"""
-        pdf_path = Path(pdf_path)
-        if not pdf_path.exists() or pdf_path.suffix.lower() != '.pdf':
-            print(f"Skipping {pdf_path}: not a valid PDF file")
-            return []
-
-        print(f"Processing {pdf_path.name}...")
-
-        try:
-            # Convert PDF to images
-            pages = convert_from_path(pdf_path, dpi=150)
-            slide_info = []
-
-            presentation_name = pdf_path.stem
-
-            for i, page in enumerate(pages):
-                if self.single_file:
-                    # Create thumbnail
-                    thumbnail = page.copy()
-                    thumbnail.thumbnail(self.thumbnail_size, Image.Resampling.LANCZOS)
-
-                    # Convert to base64
-                    img_data_uri = self.image_to_base64(page)
-                    thumb_data_uri = self.image_to_base64(thumbnail)
-
-                    slide_info.append({
-                        'presentation': presentation_name,
-                        'page': i + 1,
-                        'image': img_data_uri,
-                        'thumbnail': thumb_data_uri,
-                        'id': f"{presentation_name}_page_{i+1}"
-                    })
-                else:
-                    # Save to files (original behavior)
-                    img_filename = f"{presentation_name}_page_{i+1:03d}.png"
-                    thumb_filename = f"{presentation_name}_page_{i+1:03d}_thumb.png"
-
-                    img_path = self.output_dir / "images" / img_filename
-                    thumb_path = self.output_dir / "thumbnails" / thumb_filename
+import html
+from io import BytesIO, StringIO
 
-                    # Save full image
-                    page.save(img_path, "PNG", quality=self.quality, optimize=True)
+# Smallest page range handed to a worker; splitting decks finer than this
+# costs more in pdftoppm startup than it gains in load balancing.
+MIN_PAGES_PER_TASK = 8
 
-                    # Create and save thumbnail
-                    page.thumbnail(self.thumbnail_size, Image.Resampling.LANCZOS)
-                    page.save(thumb_path, "PNG", quality=self.quality, optimize=True)
+# Build manifest kept in the output directory for incremental rebuilds
+MANIFEST_NAME = ".slideview-manifest.json"
+MANIFEST_VERSION = 1
 
-                    slide_info.append({
-                        'presentation': presentation_name,
-                        'page': i + 1,
-                        'image': f"images/{img_filename}",
-                        'thumbnail': f"thumbnails/{thumb_filename}",
-                        'id': f"{presentation_name}_page_{i+1}"
-                    })
+# PDFs that failed to convert, kept in the output directory with the reason;
+# they are skipped until the file changes or --retry-quarantined is given
+QUARANTINE_NAME = "quarantine.json"
 
-            print(f"  Converted {len(pages)} slides from {pdf_path.name}")
-            return slide_info
-
-        except Exception as e:
-            print(f"Error processing {pdf_path}: {e}")
-            return []
+# Exit status of an isolated worker that ran out of memory
+OUT_OF_MEMORY_EXIT = 86
 
-    def process_pdfs(self, pdf_paths):
-        """Process multiple PDF files"""
-        self.setup_directories()
+# While decks complete the manifest is saved at most this often (and when
+# the build is interrupted), so that a new run resumes with the decks done
+CHECKPOINT_SECONDS = 10
 
-        for pdf_path in pdf_paths:
-            slides = self.convert_pdf_to_images(pdf_path)
-            self.slides_data.extend(slides)
+# Validators of downloaded PDFs, kept in the download directory
+FETCH_CACHE_NAME = ".fetch-cache.json"
 
-    def generate_html_viewer(self):
-        """Generate the HTML viewer"""
+# Thumbnail atlases (--sprites): at most SPRITE_TILES thumbnails per image,
+# SPRITE_COLUMNS cells wide. Every cell is the full thumbnail box, so one
+# background-size works for all of them.
+SPRITE_TILES = 64
+SPRITE_COLUMNS = 8
+SPRITE_BACKGROUND = (250, 250, 250)
 
-        # Group slides by presentation
-        presentations = {}
-        for slide in self.slides_data:
-            pres_name = slide['presentation']
-            if pres_name not in presentations:
-                presentations[pres_name] = []
-            presentations[pres_name].append(slide)
+# Output formats: name -> (file extension, MIME type). png8 is a PNG with a
+# quantized 256 colour palette, which suits flat slide graphics and text.
+IMAGE_FORMATS = {
+    'png': ('.png', 'image/png'),
+    'png8': ('.png', 'image/png'),
+    'webp': ('.webp', 'image/webp'),
+    'avif': ('.avif', 'image/avif'),
+    'jpeg': ('.jpg', 'image/jpeg'),
+}
+# Candidates tried by --format auto, the smallest one within the quality budget wins
+AUTO_FORMATS = ('png', 'png8', 'webp', 'avif', 'jpeg')
 
-        # Calculate approximate file size for single file mode
-        file_size_info = ""
-        if self.single_file:
-            total_chars = sum(len(slide['image']) + len(slide['thumbnail']) for slide in self.slides_data)
-            estimated_mb = (total_chars * 0.75) / (1024 * 1024)  # Base64 is ~4/3 larger than binary
-            file_size_info = f" (Estimated size: ~{estimated_mb:.1f}MB)"
 
-        html_content = f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>PDF Slide Viewer{file_size_info}</title>
-    <style>
-        * {{
+# Styles shared by all viewer layouts
+VIEWER_CSS = """
+        * {
             margin: 0;
             padding: 0;
             box-sizing: border-box;
-        }}
+        }
 
-        body {{
+        body {
             font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
             background: #f5f5f5;
             color: #333;
-        }}
+        }
 
-        .header {{
+        .header {
             background: white;
             padding: 1rem 2rem;
             border-bottom: 1px solid #ddd;
@@ -170,132 +148,132 @@ class PDFSlideViewer:
             top: 0;
             z-index: 100;
             box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }}
+        }
 
-        .header h1 {{
+        .header h1 {
             font-size: 1.5rem;
             margin-bottom: 1rem;
-        }}
+        }
 
-        .controls {{
+        .controls {
             display: flex;
             gap: 1rem;
             flex-wrap: wrap;
             align-items: center;
-        }}
+        }
 
-        .search-box {{
+        .search-box {
             padding: 0.5rem;
             border: 1px solid #ddd;
             border-radius: 4px;
             font-size: 1rem;
             width: 300px;
             max-width: 100%;
-        }}
+        }
 
-        .view-toggle {{
+        .view-toggle {
             display: flex;
             gap: 0.5rem;
-        }}
+        }
 
-        .view-btn {{
+        .view-btn {
             padding: 0.5rem 1rem;
             border: 1px solid #ddd;
             background: white;
             cursor: pointer;
             border-radius: 4px;
             font-size: 0.9rem;
-        }}
+        }
 
-        .view-btn.active {{
+        .view-btn.active {
             background: #007acc;
             color: white;
             border-color: #007acc;
-        }}
+        }
 
-        .stats {{
+        .stats {
             font-size: 0.9rem;
             color: #666;
-        }}
+        }
 
-        .container {{
+        .container {
             padding: 2rem;
-        }}
+        }
 
-        .presentation-section {{
+        .presentation-section {
             margin-bottom: 3rem;
-        }}
+        }
 
-        .presentation-title {{
+        .presentation-title {
             font-size: 1.2rem;
             font-weight: 600;
             margin-bottom: 1rem;
             padding: 0.5rem 0;
             border-bottom: 2px solid #007acc;
             color: #007acc;
-        }}
+        }
 
-        .slides-grid {{
+        .slides-grid {
             display: grid;
             grid-template-columns: repeat(auto-fill, minmax(250px, 1fr));
             gap: 1rem;
-        }}
+        }
 
-        .slides-list {{
+        .slides-list {
             display: flex;
             flex-direction: column;
             gap: 1rem;
-        }}
+        }
 
-        .slide-card {{
+        .slide-card {
             background: white;
             border-radius: 8px;
             overflow: hidden;
             box-shadow: 0 2px 8px rgba(0,0,0,0.1);
             transition: transform 0.2s, box-shadow 0.2s;
             cursor: pointer;
-        }}
+        }
 
-        .slide-card:hover {{
+        .slide-card:hover {
             transform: translateY(-2px);
             box-shadow: 0 4px 16px rgba(0,0,0,0.15);
-        }}
+        }
 
-        .slide-image {{
+        .slide-image {
             width: 100%;
             height: auto;
             display: block;
-        }}
+        }
 
-        .slide-info {{
+        .slide-info {
             padding: 0.75rem;
             font-size: 0.9rem;
             color: #666;
             border-top: 1px solid #eee;
-        }}
+        }
 
         /* List view specific */
-        .list-view .slide-card {{
+        .list-view .slide-card {
             display: flex;
             align-items: center;
             padding: 1rem;
-        }}
+        }
 
-        .list-view .slide-image {{
+        .list-view .slide-image {
             width: 120px;
             height: auto;
             margin-right: 1rem;
             border-radius: 4px;
-        }}
+        }
 
-        .list-view .slide-info {{
+        .list-view .slide-info {
             padding: 0;
             border: none;
             flex: 1;
-        }}
+        }
 
         /* Modal */
-        .modal {{
+        .modal {
             display: none;
             position: fixed;
             top: 0;
@@ -305,24 +283,24 @@ class PDFSlideViewer:
             background: rgba(0, 0, 0, 0.9);
             z-index: 1000;
             overflow: auto;
-        }}
+        }
 
-        .modal-content {{
+        .modal-content {
             display: flex;
             align-items: center;
             justify-content: center;
             min-height: 100vh;
             padding: 2rem;
             position: relative;
-        }}
+        }
 
-        .modal-image {{
+        .modal-image {
             max-width: 90%;
             max-height: 90vh;
             object-fit: contain;
-        }}
+        }
 
-        .modal-nav {{
+        .modal-nav {
             position: absolute;
             top: 50%;
             transform: translateY(-50%);
@@ -334,21 +312,21 @@ class PDFSlideViewer:
             cursor: pointer;
             border-radius: 4px;
             transition: background-color 0.2s;
-        }}
+        }
 
-        .modal-nav:hover {{
+        .modal-nav:hover {
             background: rgba(255, 255, 255, 0.3);
-        }}
+        }
 
-        .modal-prev {{
+        .modal-prev {
             left: 2rem;
-        }}
+        }
 
-        .modal-next {{
+        .modal-next {
             right: 2rem;
-        }}
+        }
 
-        .modal-close {{
+        .modal-close {
             position: absolute;
             top: 1rem;
             right: 1rem;
@@ -358,9 +336,9 @@ class PDFSlideViewer:
             font-size: 2rem;
             cursor: pointer;
             padding: 0.5rem;
-        }}
+        }
 
-        .modal-info {{
+        .modal-info {
             position: absolute;
             bottom: 1rem;
             left: 50%;
@@ -370,98 +348,90 @@ class PDFSlideViewer:
             padding: 0.5rem 1rem;
             border-radius: 4px;
             font-size: 0.9rem;
-        }}
+        }
 
         /* Responsive */
-        @media (max-width: 768px) {{
-            .header {{
+        @media (max-width: 768px) {
+            .header {
                 padding: 1rem;
-            }}
+            }
 
-            .controls {{
+            .controls {
                 flex-direction: column;
                 align-items: stretch;
-            }}
+            }
 
-            .search-box {{
+            .search-box {
                 width: 100%;
-            }}
+            }
 
-            .container {{
+            .container {
                 padding: 1rem;
-            }}
+            }
 
-            .slides-grid {{
+            .slides-grid {
                 grid-template-columns: repeat(auto-fill, minmax(200px, 1fr));
-            }}
+            }
 
-            .modal-nav {{
+            .modal-nav {
                 padding: 0.5rem;
                 font-size: 1.5rem;
-            }}
+            }
 
-            .modal-prev {{
+            .modal-prev {
                 left: 1rem;
-            }}
+            }
 
-            .modal-next {{
+            .modal-next {
                 right: 1rem;
-            }}
-        }}
+            }
+        }
 
-        .hidden {{
+        .hidden {
             display: none !important;
-        }}
-    </style>
-</head>
-<body>
-    <div class="header">
-        <h1>PDF Slide Viewer{"" if not self.single_file else " (Single File)"}</h1>
-        <div class="controls">
-            <input type="text" class="search-box" placeholder="Search presentations or slides..." id="searchBox">
-            <div class="view-toggle">
-                <button class="view-btn active" data-view="grid">Grid</button>
-                <button class="view-btn" data-view="list">List</button>
-            </div>
-            <div class="stats">
-                <span id="slideCount">{len(self.slides_data)}</span> slides from
-                <span id="presentationCount">{len(presentations)}</span> presentations
-            </div>
-        </div>
-    </div>
+        }
 
-    <div class="container">
-        <div id="presentationsContainer">
-"""
+        /* Virtualized grid (--lazy) */
+        .virtual-grid {
+            position: relative;
+        }
 
-        # Generate presentation sections
-        for pres_name, slides in presentations.items():
-            html_content += f"""
-            <div class="presentation-section" data-presentation="{pres_name}">
-                <div class="presentation-title">{pres_name} ({len(slides)} slides)</div>
-                <div class="slides-grid" id="slides-{pres_name.replace(' ', '_')}">
-"""
+        .virtual-row {
+            position: absolute;
+            left: 0;
+            right: 0;
+        }
 
-            for slide in slides:
-                html_content += f"""
-                    <div class="slide-card" data-slide-id="{slide['id']}" data-presentation="{slide['presentation']}" data-page="{slide['page']}">
-                        <img src="{slide['thumbnail']}" alt="Slide {slide['page']}" class="slide-image" loading="lazy">
-                        <div class="slide-info">
-                            Page {slide['page']}
-                        </div>
-                    </div>
-"""
+        .virtual-row .slide-image {
+            height: var(--thumb-height);
+            object-fit: contain;
+            background: #fafafa;
+        }
 
-            html_content += """
-                </div>
-            </div>
-"""
+        .list-view .virtual-row .slide-image {
+            height: 80px;
+        }
 
-        html_content += f"""
-        </div>
-    </div>
+        .slide-placeholder .slide-image {
+            background: #e8e8e8;
+        }
+
+        /* Thumbnails over their inline placeholder, which shows until they load */
+        .slide-lqip {
+            background-size: contain;
+            background-position: center;
+            background-repeat: no-repeat;
+        }
 
-    <!-- Modal -->
+        /* Thumbnail cells of a sprite atlas (--sprites) */
+        .slide-sprite {
+            background-repeat: no-repeat;
+            background-color: #fafafa;
+        }
+"""
+
+# Full-size slide overlay shared by all viewer layouts
+VIEWER_MODAL = """<!-- Modal -->
     <div class="modal" id="slideModal">
         <div class="modal-content">
             <button class="modal-close" id="modalClose">&times;</button>
@@ -470,17 +440,79 @@ class PDFSlideViewer:
             <button class="modal-nav modal-next" id="modalNext">&#8250;</button>
             <div class="modal-info" id="modalInfo"></div>
         </div>
-    </div>
+    </div>"""
 
-    <script>
-        // Slide data
-        const slidesData = {json.dumps(self.slides_data, indent=2)};
-        let currentSlideIndex = 0;
-        let filteredSlides = [...slidesData];
+# Loads the images of the modal, shared by all viewer layouts. Slides built
+# with --srcset carry smaller renditions, [[url, width], ...] narrowest first,
+# and their page size; the narrowest one that fills the modal at the device
+# pixel ratio is shown. The page shown and the PREFETCH slides either side
+# are loaded and decoded ahead, at most DECODE_CACHE images are kept, and
+# loads for slides the reader has moved away from are cancelled.
+MODAL_IMAGE_SCRIPT = """
+        const PREFETCH = 3, DECODE_CACHE = 12;
+        const imageCache = new Map();  // url -> Image, least recently wanted first
+
+        function renditionUrl(slide, url = slide.image) {
+            if (!slide.srcset || !url) return url;
+            const [width, height] = slide.size;
+            const needed = 0.9 * Math.min(innerWidth, innerHeight * width / height) * (window.devicePixelRatio || 1);
+            const fit = slide.srcset.find(([, w]) => w >= needed);
+            return fit ? fit[0] : url;
+        }
+
+        function cacheImage(url) {
+            let img = imageCache.get(url);
+            if (img) {
+                imageCache.delete(url);
+            } else {
+                img = new Image();
+                img.decoding = 'async';
+                img.src = url;
+                img.decode().catch(() => {});
+            }
+            imageCache.set(url, img);
+            for (const [oldest, old] of imageCache) {
+                if (imageCache.size <= DECODE_CACHE) break;
+                if (!old.complete) old.removeAttribute('src');
+                imageCache.delete(oldest);
+            }
+        }
+
+        // Show urls[0] in the modal and load the others, nearest first
+        function showImages(urls) {
+            urls = urls.filter(Boolean);
+            const wanted = new Set(urls);
+            for (const [url, img] of imageCache) {
+                if (!wanted.has(url) && !img.complete) {
+                    img.removeAttribute('src');  // cancels the download
+                    imageCache.delete(url);
+                }
+            }
+            modalImage.src = urls[0] || '';
+            [...urls].reverse().forEach(cacheImage);
+        }
+
+        // Offsets of the slides to load around a slide: 0, 1, -1, 2, -2, ...
+        function nearbyOffsets() {
+            const offsets = [0];
+            for (let d = 1; d <= PREFETCH; d++) offsets.push(d, -d);
+            return offsets;
+        }
+"""
+
+# Script of the --lazy viewer. It expects `presentations` (name, slide count
+# and chunk URL per deck) and `thumbAspect` to be defined by the page. Only the
+# rows near the viewport exist in the DOM, and a presentation's chunk is
+# loaded the first time one of its cards is rendered or its slide is opened.
+# Chunks are plain scripts rather than JSON so that they also load from file://.
+LAZY_VIEWER_SCRIPT = """
+        const GAP = 16, MIN_CARD = 250, INFO_HEIGHT = 42, HEADER_HEIGHT = 60;
+        const SECTION_GAP = 48, LIST_ROW_HEIGHT = 112, OVERSCAN = 800;
 
         // Elements
         const searchBox = document.getElementById('searchBox');
-        const presentationsContainer = document.getElementById('presentationsContainer');
+        const searchInfo = document.getElementById('searchInfo');
+        const grid = document.getElementById('virtualGrid');
         const slideModal = document.getElementById('slideModal');
         const modalImage = document.getElementById('modalImage');
         const modalInfo = document.getElementById('modalInfo');
@@ -489,99 +521,331 @@ class PDFSlideViewer:
         const modalNext = document.getElementById('modalNext');
         const viewButtons = document.querySelectorAll('.view-btn');
 
-        // Search functionality
-        searchBox.addEventListener('input', function() {{
-            const query = this.value.toLowerCase();
-            const presentations = document.querySelectorAll('.presentation-section');
-
-            presentations.forEach(section => {{
-                const presentationName = section.dataset.presentation.toLowerCase();
-                const slides = section.querySelectorAll('.slide-card');
-                let hasVisibleSlides = false;
-
-                slides.forEach(slide => {{
-                    const slideText = `${{slide.dataset.presentation}} page ${{slide.dataset.page}}`.toLowerCase();
-                    const isVisible = slideText.includes(query) || presentationName.includes(query);
-                    slide.style.display = isVisible ? '' : 'none';
-                    if (isVisible) hasVisibleSlides = true;
-                }});
+        const chunks = [];
+        const chunkRequests = new Map();
+        const renderedRows = new Map();
+        let sections = [];  // visible presentations: {index, offsets}
+        let rows = [];      // layout rows: {top, height, section, start}; start < 0 is a title row
+        let columns = 1;
+        let listView = false;
+        let renderQueued = false;
+        let current = null;
+        let searchIndex = null;
+        let searchIndexRequest = null;
 
-                section.style.display = hasVisibleSlides ? '' : 'none';
-            }});
-        }});
+        // Chunk loading
+        window.slideviewChunk = function(index, slides) {
+            chunks[index] = slides;
+            const request = chunkRequests.get(index);
+            if (request) request.resolve(slides);
+        };
 
-        // View toggle
-        viewButtons.forEach(btn => {{
-            btn.addEventListener('click', function() {{
-                viewButtons.forEach(b => b.classList.remove('active'));
-                this.classList.add('active');
+        function loadChunk(index) {
+            if (chunks[index]) return Promise.resolve(chunks[index]);
+            let request = chunkRequests.get(index);
+            if (!request) {
+                request = {};
+                request.promise = new Promise((resolve, reject) => {
+                    request.resolve = resolve;
+                    const script = document.createElement('script');
+                    script.src = presentations[index].chunk;
+                    script.onerror = () => {
+                        chunkRequests.delete(index);
+                        script.remove();
+                        reject(new Error(`Could not load ${script.src}`));
+                    };
+                    document.head.appendChild(script);
+                });
+                chunkRequests.set(index, request);
+            }
+            return request.promise;
+        }
 
-                const view = this.dataset.view;
-                const grids = document.querySelectorAll('.slides-grid');
+        window.slideviewSearchIndex = function(index) {
+            searchIndex = index;
+        };
 
-                grids.forEach(grid => {{
-                    grid.className = view === 'list' ? 'slides-list' : 'slides-grid';
-                }});
+        function loadSearchIndex() {
+            if (!searchIndexRequest) {
+                searchIndexRequest = new Promise((resolve, reject) => {
+                    const script = document.createElement('script');
+                    script.src = searchIndexUrl;
+                    script.onload = () => resolve(searchIndex);
+                    script.onerror = () => reject(new Error(`Could not load ${script.src}`));
+                    document.head.appendChild(script);
+                });
+            }
+            return searchIndexRequest;
+        }
 
-                document.body.className = view === 'list' ? 'list-view' : '';
-            }});
-        }});
+        // Names and page numbers are matched directly, slide text through the index;
+        // slide positions in the index count through the presentations in order
+        function filterSections(query) {
+            const textMatches = searchSlides(searchIndex, query);
+            sections = [];
+            let slideCount = 0;
+            let base = 0;
+            presentations.forEach((presentation, index) => {
+                const name = presentation.name.toLowerCase();
+                const offsets = [];
+                for (let offset = 0; offset < presentation.count; offset++) {
+                    if (!query || name.includes(query) || `${name} page ${offset + 1}`.includes(query)
+                            || (textMatches !== null && textMatches.has(base + offset))) {
+                        offsets.push(offset);
+                    }
+                }
+                if (offsets.length) {
+                    sections.push({index, offsets});
+                    slideCount += offsets.length;
+                }
+                base += presentation.count;
+            });
+            document.getElementById('slideCount').textContent = slideCount;
+            document.getElementById('presentationCount').textContent = sections.length;
+        }
 
-        // Modal functionality
-        function openModal(slideId) {{
-            const slideIndex = slidesData.findIndex(s => s.id === slideId);
-            if (slideIndex === -1) return;
+        function runSearch(query) {
+            const started = performance.now();
+            filterSections(query);
+            const elapsed = performance.now() - started;
+            searchInfo.textContent = query ? `(${elapsed.toFixed(1)} ms)` : '';
+            layout();
+        }
 
-            currentSlideIndex = slideIndex;
-            showSlide(slideIndex);
+        // Virtualized layout
+        function layout() {
+            const width = grid.clientWidth;
+            columns = listView ? 1 : Math.max(1, Math.floor((width + GAP) / (MIN_CARD + GAP)));
+            const cardWidth = (width - GAP * (columns - 1)) / columns;
+            const thumbHeight = Math.round(cardWidth * thumbAspect);
+            grid.style.setProperty('--thumb-height', `${thumbHeight}px`);
+            const rowHeight = listView ? LIST_ROW_HEIGHT : thumbHeight + INFO_HEIGHT;
+
+            rows = [];
+            let top = 0;
+            sections.forEach((section, s) => {
+                rows.push({top, height: HEADER_HEIGHT, section: s, start: -1});
+                top += HEADER_HEIGHT;
+                for (let start = 0; start < section.offsets.length; start += columns) {
+                    rows.push({top, height: rowHeight, section: s, start});
+                    top += rowHeight + GAP;
+                }
+                top += SECTION_GAP;
+            });
+            grid.style.height = `${top}px`;
+
+            renderedRows.forEach(element => element.remove());
+            renderedRows.clear();
+            render();
+        }
+
+        function firstRowEndingAfter(y) {
+            let low = 0, high = rows.length;
+            while (low < high) {
+                const mid = (low + high) >> 1;
+                if (rows[mid].top + rows[mid].height < y) low = mid + 1;
+                else high = mid;
+            }
+            return low;
+        }
+
+        function render() {
+            renderQueued = false;
+            const gridTop = grid.getBoundingClientRect().top + window.scrollY;
+            const viewTop = window.scrollY - gridTop - OVERSCAN;
+            const viewBottom = window.scrollY - gridTop + window.innerHeight + OVERSCAN;
+
+            const wanted = new Set();
+            for (let r = firstRowEndingAfter(viewTop); r < rows.length && rows[r].top <= viewBottom; r++) {
+                wanted.add(r);
+                if (!renderedRows.has(r)) {
+                    const element = renderRow(rows[r]);
+                    grid.appendChild(element);
+                    renderedRows.set(r, element);
+                }
+            }
+            renderedRows.forEach((element, r) => {
+                if (!wanted.has(r)) {
+                    element.remove();
+                    renderedRows.delete(r);
+                }
+            });
+        }
+
+        function scheduleRender() {
+            if (!renderQueued) {
+                renderQueued = true;
+                requestAnimationFrame(render);
+            }
+        }
+
+        function refreshPresentation(index) {
+            renderedRows.forEach((element, r) => {
+                if (rows[r].start >= 0 && sections[rows[r].section].index === index) {
+                    element.remove();
+                    renderedRows.delete(r);
+                }
+            });
+            scheduleRender();
+        }
+
+        function renderRow(row) {
+            const section = sections[row.section];
+            const presentation = presentations[section.index];
+            const element = document.createElement('div');
+            element.className = 'virtual-row';
+            element.style.top = `${row.top}px`;
+            element.style.height = `${row.height}px`;
+
+            if (row.start < 0) {
+                const title = document.createElement('div');
+                title.className = 'presentation-title';
+                title.textContent = `${presentation.name} (${presentation.count} slides)`;
+                element.appendChild(title);
+                return element;
+            }
+
+            const slides = chunks[section.index];
+            if (!slides) {
+                loadChunk(section.index).then(() => refreshPresentation(section.index), console.error);
+            }
+            const cards = document.createElement('div');
+            cards.className = listView ? 'slides-list' : 'slides-grid';
+            if (!listView) cards.style.gridTemplateColumns = `repeat(${columns}, 1fr)`;
+            section.offsets.slice(row.start, row.start + columns).forEach(offset => {
+                cards.appendChild(renderCard(section.index, offset, slides && slides[offset]));
+            });
+            element.appendChild(cards);
+            return element;
+        }
+
+        function renderCard(index, offset, slide) {
+            const card = document.createElement('div');
+            card.className = 'slide-card';
+            card.dataset.index = index;
+            card.dataset.offset = offset;
+            const image = document.createElement(slide && slide.sprite ? 'div' : 'img');
+            image.className = 'slide-image';
+            if (slide && slide.sprite) {
+                showSprite(image, slide);
+            } else if (slide) {
+                if (slide.placeholder) {
+                    image.classList.add('slide-lqip');
+                    image.style.backgroundImage = `url('${slide.placeholder}')`;
+                }
+                image.src = slide.thumbnail;
+                image.alt = `Slide ${slide.page}`;
+            } else {
+                card.classList.add('slide-placeholder');
+            }
+            const info = document.createElement('div');
+            info.className = 'slide-info';
+            info.textContent = `Page ${slide ? slide.page : offset + 1}`;
+            card.append(image, info);
+            return card;
+        }
+
+        // sprite is [column, row, columns, rows] of the slide's cell in its atlas
+        function showSprite(element, slide) {
+            const [x, y, columns, rows] = slide.sprite;
+            element.classList.add('slide-sprite');
+            element.setAttribute('role', 'img');
+            element.setAttribute('aria-label', `Slide ${slide.page}`);
+            element.style.backgroundImage = `url("${encodeURI(slide.thumbnail)}")`;
+            element.style.backgroundSize = `${columns * 100}% ${rows * 100}%`;
+            element.style.backgroundPosition = `${columns > 1 ? 100 * x / (columns - 1) : 0}% ${rows > 1 ? 100 * y / (rows - 1) : 0}%`;
+        }
+
+        searchBox.addEventListener('focus', () => loadSearchIndex().catch(console.error), {once: true});
+        searchBox.addEventListener('input', function() {
+            const query = this.value.toLowerCase().trim();
+            runSearch(query);
+            if (!searchIndex && query) {
+                loadSearchIndex().then(() => {
+                    if (searchBox.value.toLowerCase().trim() === query) runSearch(query);
+                }, console.error);
+            }
+        });
+
+        // View toggle
+        viewButtons.forEach(btn => {
+            btn.addEventListener('click', function() {
+                viewButtons.forEach(b => b.classList.remove('active'));
+                this.classList.add('active');
+                listView = this.dataset.view === 'list';
+                document.body.className = listView ? 'list-view' : '';
+                layout();
+            });
+        });
+
+        window.addEventListener('scroll', scheduleRender, {passive: true});
+        window.addEventListener('resize', () => requestAnimationFrame(layout));
+
+        // Modal functionality; navigation walks all slides in build order
+        function openModal(index, offset) {
+            current = {index, offset};
+            showSlide();
             slideModal.style.display = 'block';
             document.body.style.overflow = 'hidden';
-        }}
+        }
 
-        function closeModal() {{
+        function closeModal() {
             slideModal.style.display = 'none';
             document.body.style.overflow = '';
-        }}
+        }
 
-        function showSlide(index) {{
-            const slide = slidesData[index];
-            modalImage.src = slide.image;
-            modalImage.alt = `${{slide.presentation}} - Page ${{slide.page}}`;
-            modalInfo.textContent = `${{slide.presentation}} - Page ${{slide.page}} of ${{slidesData.filter(s => s.presentation === slide.presentation).length}}`;
-        }}
+        async function showSlide() {
+            const target = current;
+            const slides = await loadChunk(target.index);
+            if (current !== target) return;  // the user already moved on
+            const slide = slides[target.offset];
+            const presentation = presentations[target.index];
+            showImages(nearbyOffsets().map(d => slides[target.offset + d]).filter(Boolean).map(s => renditionUrl(s)));
+            modalImage.alt = `${presentation.name} - Page ${slide.page}`;
+            modalInfo.textContent = `${presentation.name} - Page ${slide.page} of ${presentation.count}`;
+        }
 
-        function nextSlide() {{
-            currentSlideIndex = (currentSlideIndex + 1) % slidesData.length;
-            showSlide(currentSlideIndex);
-        }}
+        // Past either end of a presentation, on to the next one with slides;
+        // unreadable decks are listed with none
+        function step(delta) {
+            let {index, offset} = current;
+            offset += delta;
+            if (offset >= presentations[index].count) {
+                do index = (index + 1) % presentations.length; while (!presentations[index].count);
+                offset = 0;
+            } else if (offset < 0) {
+                do index = (index - 1 + presentations.length) % presentations.length; while (!presentations[index].count);
+                offset = presentations[index].count - 1;
+            }
+            current = {index, offset};
+            showSlide();
+        }
 
-        function prevSlide() {{
-            currentSlideIndex = (currentSlideIndex - 1 + slidesData.length) % slidesData.length;
-            showSlide(currentSlideIndex);
-        }}
+        const nextSlide = () => step(1);
+        const prevSlide = () => step(-1);
 
         // Event listeners
-        document.addEventListener('click', function(e) {{
-            if (e.target.closest('.slide-card')) {{
-                const slideCard = e.target.closest('.slide-card');
-                openModal(slideCard.dataset.slideId);
-            }}
-        }});
+        grid.addEventListener('click', function(e) {
+            const slideCard = e.target.closest('.slide-card');
+            if (slideCard) {
+                openModal(Number(slideCard.dataset.index), Number(slideCard.dataset.offset));
+            }
+        });
 
         modalClose.addEventListener('click', closeModal);
         modalPrev.addEventListener('click', prevSlide);
         modalNext.addEventListener('click', nextSlide);
 
-        slideModal.addEventListener('click', function(e) {{
-            if (e.target === slideModal) {{
+        slideModal.addEventListener('click', function(e) {
+            if (e.target === slideModal) {
                 closeModal();
-            }}
-        }});
+            }
+        });
 
         // Keyboard navigation
-        document.addEventListener('keydown', function(e) {{
-            if (slideModal.style.display === 'block') {{
-                switch(e.key) {{
+        document.addEventListener('keydown', function(e) {
+            if (slideModal.style.display === 'block') {
+                switch(e.key) {
                     case 'Escape':
                         closeModal();
                         break;
@@ -591,96 +855,3403 @@ class PDFSlideViewer:
                     case 'ArrowRight':
                         nextSlide();
                         break;
-                }}
-            }}
-        }});
-
-        // Preload next/prev images for smooth navigation
-        function preloadImages() {{
-            slidesData.forEach((slide, index) => {{
-                if (index < 10) {{ // Preload first 10 images
-                    const img = new Image();
-                    img.src = slide.image;
-                }}
-            }});
-        }}
+                }
+            }
+        });
 
         // Initialize
-        preloadImages();
-    </script>
-</body>
-</html>"""
+        filterSections('');
+        layout();
+"""
 
-        # Write HTML file
-        html_path = self.output_dir / "index.html"
-        with open(html_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
 
-        print(f"\nHTML viewer generated: {html_path}")
-        print(f"Total slides processed: {len(self.slides_data)}")
+def format_available(fmt):
+    """Check whether Pillow can encode the given output format"""
+    if fmt != 'avif':
+        return fmt in IMAGE_FORMATS
+    if features.check('avif'):
+        return True
+    try:
+        import pillow_avif  # noqa: F401  (registers the AVIF plugin on older Pillow)
+        return True
+    except ImportError:
+        return False
 
-        if self.single_file:
-            file_size = html_path.stat().st_size / (1024 * 1024)
-            print(f"Single file size: {file_size:.1f}MB")
-            print(f"Self-contained HTML file ready for sharing!")
-        else:
-            print(f"Multi-file viewer with separate image assets")
 
-        print(f"Open {html_path} in your browser to view slides")
+def psnr(original, encoded):
+    """Peak signal-to-noise ratio in dB between two images of the same size"""
+    diff = ImageChops.difference(original.convert('RGB'), encoded.convert('RGB'))
+    mse = sum(rms * rms for rms in ImageStat.Stat(diff).rms) / 3
+    return float('inf') if mse == 0 else 10 * math.log10(255 * 255 / mse)
 
-def main():
-    parser = argparse.ArgumentParser(description='Convert PDFs to a browsable slide viewer')
-    parser.add_argument('pdfs', nargs='+', help='PDF files or directory containing PDFs')
-    parser.add_argument('--output', '-o', default='slide_viewer', help='Output directory (default: slide_viewer)')
-    parser.add_argument('--thumbnail-size', default='300x200', help='Thumbnail size as WIDTHxHEIGHT (default: 300x200)')
-    parser.add_argument('--quality', type=int, default=85, help='Image quality 1-100 (default: 85)')
-    parser.add_argument('--single-file', action='store_true', help='Create a single HTML file with embedded images (larger file, easier to share)')
 
-    args = parser.parse_args()
+# Low-quality placeholders: a copy of each thumbnail at most this big is
+# inlined into the card markup and shows, scaled up, until the thumbnail loads
+PLACEHOLDER_SIZE = (16, 16)
 
-    # Parse thumbnail size
-    try:
-        width, height = map(int, args.thumbnail_size.split('x'))
-        thumbnail_size = (width, height)
-    except ValueError:
-        print("Error: thumbnail-size must be in format WIDTHxHEIGHT (e.g., 300x200)")
-        sys.exit(1)
 
-    # Collect PDF files
-    pdf_files = []
-    for path_arg in args.pdfs:
-        path = Path(path_arg)
-        if path.is_file() and path.suffix.lower() == '.pdf':
-            pdf_files.append(path)
-        elif path.is_dir():
-            pdf_files.extend(path.glob('*.pdf'))
-            pdf_files.extend(path.glob('*.PDF'))
-        else:
-            print(f"Warning: {path} is not a valid PDF file or directory")
+def placeholder_uri(image):
+    """Data URI of a PLACEHOLDER_SIZE copy of an image, WebP where Pillow can write it (about 120 bytes)"""
+    image = image.convert('RGB')
+    image.thumbnail(PLACEHOLDER_SIZE, Image.Resampling.BOX)
+    buffer = BytesIO()
+    if features.check('webp'):
+        image.save(buffer, 'WEBP', quality=40, method=6)
+        return f"data:image/webp;base64,{base64.b64encode(buffer.getvalue()).decode('ascii')}"
+    image.save(buffer, 'PNG', optimize=True)
+    return f"data:image/png;base64,{base64.b64encode(buffer.getvalue()).decode('ascii')}"
 
-    if not pdf_files:
-        print("No PDF files found!")
-        sys.exit(1)
 
-    print(f"Found {len(pdf_files)} PDF files")
+def pixel_digest(image):
+    """Hex digest of the mode, size and pixels of an image; equal for identical renders"""
+    digest = hashlib.sha1(f"{image.mode} {image.width}x{image.height} ".encode('ascii'))
+    digest.update(image.tobytes())
+    return digest.hexdigest()[:20]
+
+
+def difference_hash(image):
+    """256-bit dHash: whether brightness falls to the right, on a 17x16 grayscale copy
+
+    Re-rendered, re-compressed or recoloured copies of a slide give hashes
+    a few bits apart. Slides that differ only in small text can too, so a
+    close hash is a reason to compare two pages, not proof they match.
+    """
+    pixels = image.convert('L').resize((17, 16), Image.Resampling.BOX).tobytes()
+    value = 0
+    for row in range(0, 17 * 16, 17):
+        for x in range(row, row + 16):
+            value = value << 1 | (pixels[x] > pixels[x + 1])
+    return value
+
+
+# Largest difference in gray level, at thumbnail size, between pages that
+# count as near-identical: enough for recompressed photos and recoloured
+# templates, too little for a changed word or page number
+NEAR_DUPLICATE_TOLERANCE = 48
+
+
+class DuplicateIndex:
+    """Finds the first page added with the same pixels, or a near-identical one
+
+    Pages are added with their pixel digest, size and dHash. With a
+    distance, pages of the same size whose dHashes differ in at most that
+    many bits are candidates, and the first one the accept callback agrees
+    with is a match. The 256 bits are cut into distance + 1 bands: hashes
+    that close agree on at least one band, so only pages sharing a band
+    are looked at.
+    """
+
+    def __init__(self, distance=0):
+        self.distance = distance
+        self.bounds = [256 * i // (distance + 1) for i in range(distance + 2)]
+        self.exact = {}
+        self.bands = {}
+
+    def band_keys(self, size, dhash):
+        """One lookup key per band of a dHash"""
+        return [(i, size, dhash >> (256 - end) & ((1 << (end - start)) - 1))
+                for i, (start, end) in enumerate(zip(self.bounds, self.bounds[1:]))]
+
+    def find(self, digest, size, dhash=None, accept=None):
+        """The first page with the same digest, or a near-identical accepted one; None if there is none"""
+        if digest in self.exact:
+            return self.exact[digest]
+        if not self.distance or dhash is None:
+            return None
+        seen = set()
+        for key in self.band_keys(tuple(size), dhash):
+            for other, item in self.bands.get(key, ()):
+                if id(item) not in seen and (other ^ dhash).bit_count() <= self.distance:
+                    seen.add(id(item))
+                    if accept is None or accept(item):
+                        return item
+        return None
+
+    def add(self, digest, size, dhash, item):
+        """Add a page that is not a copy of an earlier one"""
+        self.exact[digest] = item
+        if self.distance and dhash is not None:
+            for key in self.band_keys(tuple(size), dhash):
+                self.bands.setdefault(key, []).append((dhash, item))
+
+
+# Full-text search. Terms are lowercased, stripped of diacritics and stemmed
+# with CISTEM (Weissweiler & Fraser, 2017), a small German stemmer that is
+# also harmless on English text. SEARCH_SCRIPT repeats exactly the same steps
+# in the browser, so both sides must be changed together.
+STOPWORDS = frozenset("""
+    aber als am an auch auf aus bei bis das dass dem den der des die ein eine einem einen einer eines
+    es fur hat im in ist mit nach nicht noch oder sich sie sind so und uber um von vor wie wir zu zum zur
+    a an and are as at be by for from in is it of on or that the this to was with
+""".split())
+
+
+def normalize_text(text):
+    """Lowercase text, fold diacritics and expand the sharp s"""
+    text = unicodedata.normalize('NFKD', text.lower().replace('ß', 'ss'))
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def stem_word(word):
+    """CISTEM stem of a normalized word; cached, as the same words come back on every slide"""
+    word = re.sub(r'^ge(.{4,})', r'\1', word)
+    word = word.replace('sch', '\x01').replace('ei', '\x02').replace('ie', '\x03')
+    word = re.sub(r'(.)\1', '\\1\x04', word)
+    while len(word) > 3:
+        if len(word) > 5 and (word.endswith('em') or word.endswith('er') or word.endswith('nd')):
+            word = word[:-2]
+        elif word[-1] in 'tesn':
+            word = word[:-1]
+        else:
+            break
+    word = re.sub('(.)\x04', r'\1\1', word)
+    return word.replace('\x03', 'ie').replace('\x02', 'ei').replace('\x01', 'sch')
+
+
+def search_terms(text):
+    """Split text into the stemmed terms used by the search index"""
+    return [stem_word(token) for token in re.findall(r'[^\W_]+', normalize_text(text))
+            if 1 < len(token) <= 40 and token not in STOPWORDS]
+
+
+def to_base36(number):
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+    encoded = ''
+    while True:
+        number, remainder = divmod(number, 36)
+        encoded = digits[remainder] + encoded
+        if not number:
+            return encoded
+
+
+def build_search_index(slides):
+    """Build an inverted index over the extracted text of slides
+
+    Terms are sorted so the viewer can binary-search them and match the
+    last query word as a prefix. Each posting list holds slide positions as
+    base-36 deltas joined by dots, which keeps the index small enough to
+    ship with the page.
+    """
+    postings = {}
+    for number, slide in enumerate(slides):
+        for term in set(search_terms(slide.get('text', ''))):
+            postings.setdefault(term, []).append(number)
+
+    terms = sorted(postings)
+    encoded = []
+    for term in terms:
+        previous = 0
+        deltas = []
+        for number in postings[term]:
+            deltas.append(to_base36(number - previous))
+            previous = number
+        encoded.append('.'.join(deltas))
+    return {'terms': terms, 'postings': encoded}
+
+
+# Query side of the search index, shared by all viewer layouts. Defines
+# searchSlides(index, query), which returns the set of matching slide
+# positions, or null when the query has no indexed words.
+SEARCH_SCRIPT = """
+        const STOPWORDS = new Set(%s);
+        const decodedPostings = new Map();
+
+        function normalizeText(text) {
+            return text.toLowerCase().replace(/ß/g, 'ss').normalize('NFKD').replace(/\\p{M}/gu, '');
+        }
+
+        function stemWord(word) {
+            word = word.replace(/^ge(.{4,})/, '$1');
+            word = word.replace(/sch/g, '\\x01').replace(/ei/g, '\\x02').replace(/ie/g, '\\x03');
+            word = word.replace(/(.)\\1/g, '$1\\x04');
+            while (word.length > 3) {
+                if (word.length > 5 && /(em|er|nd)$/.test(word)) {
+                    word = word.slice(0, -2);
+                } else if ('tesn'.includes(word[word.length - 1])) {
+                    word = word.slice(0, -1);
+                } else {
+                    break;
+                }
+            }
+            word = word.replace(/(.)\\x04/g, '$1$1');
+            return word.replace(/\\x03/g, 'ie').replace(/\\x02/g, 'ei').replace(/\\x01/g, 'sch');
+        }
+
+        function queryTerms(query) {
+            return (normalizeText(query).match(/[\\p{L}\\p{N}]+/gu) || [])
+                .filter(token => token.length > 1 && token.length <= 40 && !STOPWORDS.has(token))
+                .map(stemWord);
+        }
+
+        function postingsAt(index, position) {
+            if (!decodedPostings.has(position)) {
+                let previous = 0;
+                decodedPostings.set(position, index.postings[position].split('.').map(delta => {
+                    previous += parseInt(delta, 36);
+                    return previous;
+                }));
+            }
+            return decodedPostings.get(position);
+        }
+
+        function lowerBound(terms, term) {
+            let low = 0, high = terms.length;
+            while (low < high) {
+                const mid = (low + high) >> 1;
+                if (terms[mid] < term) low = mid + 1;
+                else high = mid;
+            }
+            return low;
+        }
+
+        // Every word must match; the last one also matches as a prefix while typing
+        function searchSlides(index, query) {
+            const terms = queryTerms(query);
+            if (!index || !terms.length) return null;
+            let result = null;
+            terms.forEach((term, i) => {
+                const matches = new Set();
+                const isLast = i === terms.length - 1 && !/\\s$/.test(query);
+                for (let position = lowerBound(index.terms, term); position < index.terms.length; position++) {
+                    const candidate = index.terms[position];
+                    if (candidate !== term && !(isLast && candidate.startsWith(term))) break;
+                    postingsAt(index, position).forEach(slide => matches.add(slide));
+                }
+                result = result === null ? matches : new Set([...result].filter(slide => matches.has(slide)));
+            });
+            return result;
+        }
+""" % json.dumps(sorted(STOPWORDS))
+
+
+@contextlib.contextmanager
+def replacing(path):
+    """Yield a temporary path next to path, which replaces path when the block completes
+
+    Readers see the old file or the new one, never a half-written one. The
+    name is unique per process and thread, so concurrent writers of the same
+    file do not share it, and it is removed if the block fails.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+@contextlib.contextmanager
+def atomic_open(path, mode='w'):
+    """open() a file for writing through replacing(); text is UTF-8"""
+    with replacing(path) as tmp_path, open(tmp_path, mode, encoding=None if 'b' in mode else 'utf-8') as f:
+        yield f
+
+
+# Span categories that do actual work; "deck" and "page" spans only group them
+PROFILE_STAGES = ('render', 'text', 'thumbnail', 'encode', 'base64', 'write', 'hash', 'html')
+
+
+class Tracer:
+    """Collect timed spans as Chrome trace events
+
+    Spans are complete ("X") events with microsecond timestamps taken from
+    the monotonic clock, which is shared by all processes on the machine, so
+    events recorded in worker processes line up with those of the parent.
+    A disabled tracer records nothing and costs one attribute check per span.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.events = []
+        self.named_threads = set()
+
+    @contextlib.contextmanager
+    def span(self, name, cat, **args):
+        """Time the body of a with block as one span"""
+        if not self.enabled:
+            yield
+            return
+        started = time.monotonic_ns()
+        try:
+            yield
+        finally:
+            ended = time.monotonic_ns()
+            thread = (os.getpid(), threading.get_native_id())
+            if thread not in self.named_threads:
+                # Pipeline stages run on named threads; label their tracks
+                self.named_threads.add(thread)
+                self.events.append({'name': 'thread_name', 'ph': 'M', 'pid': thread[0], 'tid': thread[1],
+                                    'args': {'name': threading.current_thread().name}})
+            self.events.append({
+                'name': name, 'cat': cat, 'ph': 'X',
+                'ts': started // 1000, 'dur': max(1, (ended - started) // 1000),
+                'pid': os.getpid(), 'tid': threading.get_native_id(), 'args': args,
+            })
+
+    def write(self, path):
+        """Write the events as a trace file for chrome://tracing or Perfetto"""
+        main_pid = os.getpid()
+        metadata = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0,
+                     'args': {'name': 'slideview' if pid == main_pid else f'worker {pid}'}}
+                    for pid in sorted({event['pid'] for event in self.events})]
+        with atomic_open(path) as f:
+            json.dump({'traceEvents': metadata + self.events, 'displayTimeUnit': 'ms'}, f, separators=(',', ':'))
+
+    def stage_breakdown(self, parents, by_thread=True):
+        """Time per stage spent inside each of the given spans, in microseconds
+
+        A span contains the stage spans recorded on the same thread (or with
+        by_thread=False, in the same process) within its interval; deck and
+        page spans themselves are not counted.
+        """
+        def owner(event):
+            return (event['pid'], event['tid']) if by_thread else event['pid']
+
+        threads = {}
+        stage_events = [event for event in self.events if event.get('cat') in PROFILE_STAGES]
+        for event in sorted(stage_events, key=lambda event: event['ts']):
+            threads.setdefault(owner(event), []).append(event)
+        starts = {key: [event['ts'] for event in events] for key, events in threads.items()}
+
+        breakdowns = []
+        for parent in parents:
+            key = owner(parent)
+            events = threads.get(key, [])
+            end = parent['ts'] + parent['dur']
+            stages = dict.fromkeys(PROFILE_STAGES, 0)
+            first = bisect.bisect_left(starts.get(key, []), parent['ts'])
+            for event in events[first:]:
+                if event['ts'] > end:
+                    break
+                stages[event['cat']] += event['dur']
+            breakdowns.append(stages)
+        return breakdowns
+
+    def print_summary(self, top=10):
+        """Print the slowest decks and pages with their time per stage"""
+        spans = [event for event in self.events if event['ph'] == 'X']
+        if not spans:
+            return
+
+        def table(title, parents, label, by_thread=True):
+            if not parents:
+                return
+            parents = sorted(parents, key=lambda event: event['dur'], reverse=True)[:top]
+            print(f"\n{title}:")
+            print(f"  {'ms':>9}  " + ''.join(f"{stage:>10}" for stage in PROFILE_STAGES[:-2]) + "  name")
+            for parent, stages in zip(parents, self.stage_breakdown(parents, by_thread)):
+                columns = ''.join(f"{stages[stage] / 1000:10.1f}" for stage in PROFILE_STAGES[:-2])
+                print(f"  {parent['dur'] / 1000:9.1f}  {columns}  {label(parent)}")
+
+        # Decks split over several workers are reported per page range. A
+        # process converts one deck at a time, but may render on other threads
+        table(f"Slowest decks (top {top})", [event for event in spans if event['cat'] == 'deck'],
+              lambda event: event['args']['pdf'] + (f" (pages {event['args']['first_page']}-{event['args']['last_page']})"
+                                                    if event['args'].get('first_page') else ""), by_thread=False)
+        table(f"Slowest pages (top {top})", [event for event in spans if event['cat'] == 'page'],
+              lambda event: f"{event['args']['pdf']} page {event['args']['page']}")
+
+        totals = dict.fromkeys(PROFILE_STAGES, 0)
+        for event in spans:
+            if event['cat'] in totals:
+                totals[event['cat']] += event['dur']
+        total = sum(totals.values()) or 1
+        print("\nTime per stage (summed over all processes):")
+        for stage, duration in sorted(totals.items(), key=lambda item: item[1], reverse=True):
+            if duration:
+                print(f"  {stage:<10} {duration / 1e6:8.2f}s  {100 * duration / total:5.1f}%")
+
+
+# pdfinfo -f -l prints one size and one rotation line per page
+PAGE_SIZE_LINE = re.compile(r'^Page\s+(\d+) size:\s+([\d.]+) x ([\d.]+) pts', re.M)
+PAGE_ROTATION_LINE = re.compile(r'^Page\s+(\d+) rot:\s+(\d+)', re.M)
+
+
+def fit_dpi(size, fit):
+    """Resolution at which a page of size (points) fits into fit=(width, height) pixels
+
+    height may be None to fit the width only.
+    """
+    scale = fit[0] / size[0]
+    if fit[1]:
+        scale = min(scale, fit[1] / size[1])
+    return 72 * scale
+
+
+class PopplerRenderer:
+    """Render pages with poppler's pdftoppm, through pdf2image
+
+    Without stream the whole page range is rendered into memory by one
+    pdftoppm call. With stream pages are rendered into a temporary folder,
+    stream_chunk pages at a time, and each image is opened only while it is
+    being processed.
+    """
+
+    name = 'pdftoppm'
+    # Errors that mean the PDF itself is broken, rather than the renderer
+    document_errors = (PDFPageCountError, PDFSyntaxError, subprocess.CalledProcessError)
+
+    def __init__(self, dpi=150, stream=False, stream_chunk=8, tracer=None):
+        self.dpi = dpi
+        self.stream = stream
+        self.stream_chunk = stream_chunk
+        self.tracer = tracer or Tracer()
+
+    def page_count(self, pdf_path):
+        """Number of pages of a PDF"""
+        return pdfinfo_from_path(pdf_path)['Pages']
+
+    def page_sizes(self, pdf_path, first_page=None, last_page=None):
+        """{page_number: (width, height)} in points, as displayed, from pdfinfo -f -l"""
+        first_page = first_page or 1
+        last_page = last_page or self.page_count(pdf_path)
+        result = subprocess.run(['pdfinfo', '-f', str(first_page), '-l', str(last_page), str(pdf_path)],
+                                capture_output=True, check=True)
+        info = result.stdout.decode('utf-8', 'replace')
+        rotations = {int(n): int(r) for n, r in PAGE_ROTATION_LINE.findall(info)}
+        sizes = {}
+        for n, width, height in PAGE_SIZE_LINE.findall(info):
+            size = (float(width), float(height))
+            sizes[int(n)] = size[::-1] if rotations.get(int(n), 0) % 180 == 90 else size
+        return sizes
+
+    def pages(self, pdf_path, first_page=None, last_page=None, fit=None):
+        """Yield (page_number, image) for a page range of a PDF
+
+        With fit=(width, height) every page is scaled to fit into that many
+        pixels (height may be None), instead of being rendered at the fixed
+        dpi. pdftoppm scales each page to a given width or height by itself,
+        so only runs of pages bound by the same side need a call of their own.
+        """
+        if fit is None:
+            yield from self.render_range(pdf_path, first_page, last_page)
+        elif not fit[1]:
+            yield from self.render_range(pdf_path, first_page, last_page, size=(fit[0], None))
+        else:
+            def bound_side(item):
+                width, height = item[1]
+                return (fit[0], None) if fit[0] / width <= fit[1] / height else (None, fit[1])
+
+            sizes = self.page_sizes(pdf_path, first_page, last_page)
+            for size, run in itertools.groupby(sorted(sizes.items()), key=bound_side):
+                run = list(run)
+                yield from self.render_range(pdf_path, run[0][0], run[-1][0], size=size)
+
+    def render_range(self, pdf_path, first_page, last_page, size=None):
+        """Yield (page_number, image) for a page range, at dpi or scaled to size=(width, height)"""
+        start = first_page or 1
+        name = Path(pdf_path).name
+        if not self.stream:
+            with self.tracer.span('pdftoppm', 'render', pdf=name, first_page=first_page, last_page=last_page):
+                pages = convert_from_path(pdf_path, dpi=self.dpi, first_page=first_page, last_page=last_page, size=size)
+            for page_number, page in enumerate(pages, start=start):
+                yield page_number, page
+            return
+
+        if last_page is None:
+            last_page = self.page_count(pdf_path)
+
+        with tempfile.TemporaryDirectory(prefix="slideview-") as tmp_dir:
+            for chunk_first in range(start, last_page + 1, self.stream_chunk):
+                chunk_last = min(chunk_first + self.stream_chunk - 1, last_page)
+                with self.tracer.span('pdftoppm', 'render', pdf=name, first_page=chunk_first, last_page=chunk_last):
+                    paths = convert_from_path(pdf_path, dpi=self.dpi, first_page=chunk_first, last_page=chunk_last,
+                                              size=size, output_folder=tmp_dir, paths_only=True)
+                # pdftoppm names its files with zero-padded page numbers
+                for page_number, path in enumerate(sorted(paths), start=chunk_first):
+                    with Image.open(path) as page:
+                        with self.tracer.span('decode', 'render', pdf=name, page=page_number):
+                            page.load()
+                        yield page_number, page
+                    os.unlink(path)
+
+    def page_text(self, pdf_path, first_page=None, last_page=None):
+        """{page_number: text} for a page range of a PDF, from pdftotext"""
+        first_page = first_page or 1
+        command = ['pdftotext', '-q', '-enc', 'UTF-8', '-f', str(first_page)]
+        if last_page:
+            command += ['-l', str(last_page)]
+        with self.tracer.span('pdftotext', 'text', pdf=Path(pdf_path).name):
+            result = subprocess.run(command + [str(pdf_path), '-'], capture_output=True, check=True)
+        # pdftotext ends every page with a form feed
+        pages = result.stdout.decode('utf-8', errors='replace').split('\f')[:-1]
+        return {first_page + i: text for i, text in enumerate(pages)}
+
+
+# pdfium keeps global state and is not thread-safe: every call into it,
+# from any renderer or thread of the process, holds this lock
+PDFIUM_LOCK = threading.Lock()
+
+
+class PdfiumRenderer:
+    """Render pages in-process with pdfium, through pypdfium2
+
+    Pages go from pdfium's bitmap straight into a PIL image, with no
+    subprocess and no temporary files. Because pdfium is not thread-safe
+    the pool threads take turns under PDFIUM_LOCK, so only one page renders
+    at a time; the pool renders up to `threads` pages ahead while the
+    caller thumbnails and encodes the previous ones. Both sides release the
+    GIL, so the two overlap. Memory stays bounded by the look-ahead, so
+    stream makes no difference here. For parallel rendering use --jobs:
+    every worker process has its own pdfium.
+    """
+
+    name = 'pdfium'
+
+    def __init__(self, dpi=150, threads=2, tracer=None):
+        try:
+            import pypdfium2
+        except ImportError:
+            raise ImportError("the pdfium renderer requires pypdfium2 (pip install pypdfium2)") from None
+        self.pdfium = pypdfium2
+        self.document_errors = (pypdfium2.PdfiumError,)
+        self.dpi = dpi
+        self.threads = threads
+        self.tracer = tracer or Tracer()
+
+    def page_count(self, pdf_path):
+        """Number of pages of a PDF"""
+        with PDFIUM_LOCK:
+            document = self.pdfium.PdfDocument(str(pdf_path))
+            try:
+                return len(document)
+            finally:
+                document.close()
+
+    def render_page(self, document, name, page_number, fit=None):
+        """Render one page of an open document into an RGB image, at dpi or to fit (see pages)"""
+        with PDFIUM_LOCK, self.tracer.span('pdfium', 'render', pdf=name, page=page_number):
+            page = document[page_number - 1]
+            try:
+                dpi = fit_dpi(page.get_size(), fit) if fit else self.dpi
+                # rev_byteorder gives RGB rather than pdfium's native BGR, so PIL need not swap
+                return page.render(scale=dpi / 72, rev_byteorder=True).to_pil()
+            finally:
+                page.close()
+
+    def pages(self, pdf_path, first_page=None, last_page=None, fit=None):
+        """Yield (page_number, image) for a page range of a PDF
+
+        With fit=(width, height) every page is rendered at the resolution
+        that fits it into that many pixels (height may be None), instead of
+        at the fixed dpi.
+        """
+        name = Path(pdf_path).name
+        with PDFIUM_LOCK:
+            document = self.pdfium.PdfDocument(str(pdf_path))
+        try:
+            last_page = min(last_page or len(document), len(document))
+            page_numbers = iter(range(first_page or 1, last_page + 1))
+            with ThreadPoolExecutor(max_workers=self.threads) as pool:
+                ahead = [(number, pool.submit(self.render_page, document, name, number, fit))
+                         for number in itertools.islice(page_numbers, self.threads)]
+                while ahead:
+                    page_number, future = ahead.pop(0)
+                    image = future.result()
+                    for number in itertools.islice(page_numbers, 1):
+                        ahead.append((number, pool.submit(self.render_page, document, name, number, fit)))
+                    yield page_number, image
+        finally:
+            with PDFIUM_LOCK:
+                document.close()
+
+    def page_text(self, pdf_path, first_page=None, last_page=None):
+        """{page_number: text} for a page range of a PDF, from pdfium's text pages
+
+        The lock is taken page by page, so that rendering goes on in between.
+        """
+        texts = {}
+        with self.tracer.span('pdfium text', 'text', pdf=Path(pdf_path).name):
+            with PDFIUM_LOCK:
+                document = self.pdfium.PdfDocument(str(pdf_path))
+            try:
+                for page_number in range(first_page or 1, min(last_page or len(document), len(document)) + 1):
+                    with PDFIUM_LOCK:
+                        page = document[page_number - 1]
+                        textpage = page.get_textpage()
+                        try:
+                            texts[page_number] = textpage.get_text_range()
+                        finally:
+                            textpage.close()
+                            page.close()
+            finally:
+                with PDFIUM_LOCK:
+                    document.close()
+        return texts
+
+
+RENDERERS = {
+    'pdftoppm': PopplerRenderer,
+    'pdfium': PdfiumRenderer,
+}
+
+
+def make_renderer(name, dpi=150, stream=False, stream_chunk=8, threads=2, tracer=None):
+    """Create a renderer by name, with the options it understands"""
+    if name == 'pdfium':
+        return PdfiumRenderer(dpi=dpi, threads=threads, tracer=tracer)
+    return PopplerRenderer(dpi=dpi, stream=stream, stream_chunk=stream_chunk, tracer=tracer)
+
+
+def iter_pipeline(items, stages, depth=4):
+    """Push items through stages of worker threads connected by bounded queues, yielding the results
+
+    stages is a list of (name, function, workers). Items are taken from the
+    items iterator on a thread of their own and handed to the first stage;
+    what a stage function returns goes to the next stage, and the results
+    of the last one are yielded as they come, in no particular order. Every
+    queue, the one of results included, holds at most depth items, so a
+    stage that runs ahead blocks instead of piling up work in memory, and
+    so does the whole pipeline while the caller does not ask for results.
+    The first exception raised anywhere stops the pipeline and is re-raised
+    once all threads are done; closing the generator stops it the same way.
+    """
+    done = object()
+    queues = [queue.Queue(maxsize=depth) for _ in range(len(stages) + 1)]
+    remaining = [workers for _, _, workers in stages]
+    lock = threading.Lock()
+    stop = threading.Event()
+    errors = []
+
+    def fail(error):
+        errors.append(error)
+        stop.set()
+
+    def feed():
+        try:
+            for item in items:
+                if stop.is_set():
+                    break
+                queues[0].put(item)
+        except Exception as e:
+            fail(e)
+        finally:
+            if hasattr(items, 'close'):
+                items.close()
+            for _ in range(stages[0][2]):
+                queues[0].put(done)
+
+    def work(index):
+        _, function, _ = stages[index]
+        outbox = queues[index + 1]
+        while (item := queues[index].get()) is not done:
+            if stop.is_set():
+                continue  # keep draining so that upstream never blocks on a full queue
+            try:
+                result = function(item)
+            except Exception as e:
+                fail(e)
+                continue
+            outbox.put(result)
+        with lock:
+            remaining[index] -= 1
+            last = not remaining[index]
+        if last:
+            for _ in range(stages[index + 1][2] if index + 1 < len(stages) else 1):
+                outbox.put(done)
+
+    threads = [threading.Thread(target=feed, name="render", daemon=True)]
+    for index, (name, _, workers) in enumerate(stages):
+        threads += [threading.Thread(target=work, args=(index,), name=f"{name}-{n}", daemon=True) for n in range(workers)]
+    for thread in threads:
+        thread.start()
+    finished = False
+    try:
+        while (result := queues[-1].get()) is not done:
+            if not stop.is_set():
+                yield result
+        finished = True
+    finally:
+        stop.set()
+        if not finished:
+            while queues[-1].get() is not done:
+                pass
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+
+
+def _convert_task(viewer_kwargs, pdf_path, first_page, last_page):
+    """Worker entry point: convert a page range of a PDF in a child process"""
+    viewer = PDFSlideViewer(**viewer_kwargs)
+    slides = viewer.convert_pdf_to_images(pdf_path, first_page, last_page)
+    return slides, viewer.encode_stats, viewer.tracer.events, viewer.failures
+
+
+def _isolated_task(connection, viewer_kwargs, pdf_path, memory_limit):
+    """Worker entry point: convert a whole PDF in a child process of its own
+
+    The process leads a new process group, so that a timeout kills the
+    renderer it started along with it, and its address space, which that
+    renderer inherits as a limit of its own, is capped at memory_limit MB.
+    """
+    os.setsid()
+    if memory_limit:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit << 20, memory_limit << 20))
+    try:
+        viewer = PDFSlideViewer(**viewer_kwargs)
+        slides = viewer.convert_pdf_to_images(pdf_path)
+        connection.send((slides, viewer.encode_stats, viewer.tracer.events, viewer.failures))
+        connection.close()
+    except (MemoryError, OSError) as e:
+        if isinstance(e, OSError) and e.errno != errno.ENOMEM:
+            raise
+        # There may be no memory left to report it in, so the exit status does
+        os._exit(OUT_OF_MEMORY_EXIT)
+
+
+class PDFSlideViewer:
+    def __init__(self, output_dir="slide_viewer", thumbnail_size=(300, 200), quality=85, single_file=False,
+                 jobs=1, stream=False, stream_chunk=8, dpi=150, use_cache=True, image_format='png',
+                 min_psnr=40.0, lazy=False, extract_text=True, profile=False, sprites=False, renderer='pdftoppm',
+                 render_threads=2, thumbnail_workers=1, encode_workers=1, queue_depth=2, width=None, dedup=None, fast=False,
+                 srcset=(), placeholders=True, timeout=None, memory_limit=None,
+                 retry_quarantined=False):
+        self.output_dir = Path(output_dir)
+        self.thumbnail_size = thumbnail_size
+        self.quality = quality
+        self.single_file = single_file
+        self.jobs = jobs
+        self.stream = stream
+        self.stream_chunk = stream_chunk
+        self.dpi = dpi
+        self.width = width
+        self.srcset = tuple(sorted(set(srcset)))
+        self.placeholders = placeholders
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.retry_quarantined = retry_quarantined
+        self.quarantined = {}
+        self.failures = {}
+        self.last_checkpoint = time.monotonic()
+        self.dedup = dedup
+        self.fast = fast
+        self.final_settings = None
+        self.stale_assets = set()
+        self.stored_pages = {}
+        self.use_cache = use_cache
+        self.image_format = image_format
+        self.min_psnr = min_psnr
+        self.lazy = lazy
+        self.extract_text = extract_text
+        self.sprites = sprites and not single_file
+        self.tracer = Tracer(profile)
+        self.render_threads = render_threads
+        self.thumbnail_workers = thumbnail_workers
+        self.encode_workers = encode_workers
+        self.queue_depth = queue_depth
+        self.renderer = make_renderer(renderer, dpi=dpi, stream=stream, stream_chunk=stream_chunk,
+                                      threads=render_threads, tracer=self.tracer)
+        self.encode_stats = {}
+        self._stats_lock = threading.Lock()
+        self.manifest = None
+        self.shard = None
+        self.slides_data = []
+        self._digests = {}
+
+    def worker_kwargs(self):
+        """Constructor arguments for an equivalent viewer in a worker process"""
+        return {
+            'output_dir': str(self.output_dir),
+            'thumbnail_size': self.thumbnail_size,
+            'quality': self.quality,
+            'single_file': self.single_file,
+            'stream': self.stream,
+            'stream_chunk': self.stream_chunk,
+            'dpi': self.dpi,
+            'image_format': self.image_format,
+            'min_psnr': self.min_psnr,
+            'extract_text': self.extract_text,
+            'profile': self.tracer.enabled,
+            'sprites': self.sprites,
+            'renderer': self.renderer.name,
+            'render_threads': self.render_threads,
+            'thumbnail_workers': self.thumbnail_workers,
+            'encode_workers': self.encode_workers,
+            'queue_depth': self.queue_depth,
+            'width': self.width,
+            'srcset': self.srcset,
+            'placeholders': self.placeholders,
+            'dedup': self.dedup,
+            'fast': self.fast,
+            'timeout': self.timeout,
+            'memory_limit': self.memory_limit,
+            'retry_quarantined': self.retry_quarantined,
+        }
+
+    def preview_viewer(self, dpi):
+        """A viewer for a quick first pass into the same output: low resolution, fast encoders
+
+        Its decks are re-rendered by this viewer afterwards, under the same
+        file names where the format allows. Decks that are already built at
+        full quality are taken as they are.
+        """
+        kwargs = self.worker_kwargs()
+        kwargs.update(jobs=self.jobs, use_cache=self.use_cache, lazy=self.lazy, profile=False, dpi=dpi, fast=True,
+                      width=self.width and max(1, self.width * dpi // self.dpi),
+                      image_format='jpeg' if self.image_format == 'auto' else self.image_format)
+        preview = PDFSlideViewer(**kwargs)
+        preview.final_settings = self.render_settings()
+        return preview
+
+    def render_settings(self):
+        """Settings that affect rendered output; a change invalidates cached decks"""
+        return {
+            'dpi': self.dpi,
+            'thumbnail_size': list(self.thumbnail_size),
+            'quality': self.quality,
+            'format': self.image_format,
+            'min_psnr': self.min_psnr if self.image_format == 'auto' else None,
+            'single_file': self.single_file,
+            'text': self.extract_text,
+            'sprites': self.sprites,
+            'renderer': self.renderer.name,
+            'width': self.width,
+            'srcset': list(self.srcset),
+            'placeholders': self.placeholders,
+            'dedup': self.dedup,
+            'fast': self.fast,
+        }
+
+    def load_manifest(self, directory=None):
+        """Load the build manifest from the output directory, or another build's"""
+        manifest_path = Path(directory or self.output_dir) / MANIFEST_NAME
+        try:
+            with open(manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == MANIFEST_VERSION:
+                return manifest
+            print(f"Ignoring {MANIFEST_NAME}: unsupported version")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable {MANIFEST_NAME}: {e}")
+        return {'version': MANIFEST_VERSION, 'presentations': {}}
+
+    def save_manifest(self):
+        """Write the build manifest atomically"""
+        with atomic_open(self.output_dir / MANIFEST_NAME) as f:
+            json.dump(self.manifest, f, separators=(',', ':'))
+
+    def file_digest(self, pdf_path):
+        """SHA-256 of a file's content, computed once per run"""
+        key = str(Path(pdf_path).resolve())
+        if key not in self._digests:
+            digest = hashlib.sha256()
+            with self.tracer.span('sha256', 'hash', pdf=Path(pdf_path).name), open(pdf_path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+            self._digests[key] = digest.hexdigest()
+        return self._digests[key]
+
+    def slide_assets(self, slide):
+        """Paths of the files a slide entry refers to, relative to the output directory"""
+        return [*(slide[key] for key in ('image', 'thumbnail') if not slide[key].startswith('data:')),
+                *(url for url, _ in slide.get('srcset', ()))]
+
+    def remove_assets(self, slides):
+        """Delete the image files of slides, except those still referred to (see remove_files)"""
+        self.remove_files(asset for slide in slides for asset in self.slide_assets(slide))
+
+    def remove_files(self, assets):
+        """Delete files of the output directory, except those a deck in the manifest or the viewer refers to
+
+        A rebuilt deck reuses the names of its files, and with dedup files
+        are shared between decks.
+        """
+        decks = [entry['slides'] for entry in self.manifest['presentations'].values()] if self.manifest else []
+        keep = {asset for slides in [*decks, self.slides_data] for slide in slides for asset in self.slide_assets(slide)}
+        for asset in set(assets) - keep:
+            (self.output_dir / asset).unlink(missing_ok=True)
+
+    def remove_stale_assets(self):
+        """Delete the files of replaced slides, once index.html no longer refers to them"""
+        self.remove_files(self.stale_assets)
+        self.stale_assets = set()
+
+    def cached_slides(self, pdf_path):
+        """Return the slides of an unchanged deck from the manifest, or None
+
+        A deck is unchanged if it was built with the same render settings and
+        its content hash matches. Size and mtime are checked first so that
+        untouched files are not hashed on every run.
+        """
+        if not self.use_cache or self.manifest is None:
+            return None
+
+        pdf_path = Path(pdf_path)
+        entry = self.manifest['presentations'].get(str(pdf_path.resolve()))
+        # A --preview pass also takes decks that are already built at full quality
+        if not entry or entry['settings'] not in (self.render_settings(), self.final_settings):
+            return None
+
+        stat = pdf_path.stat()
+        if (entry['size'], entry['mtime_ns']) != (stat.st_size, stat.st_mtime_ns):
+            if entry['sha256'] != self.file_digest(pdf_path):
+                return None
+            entry['size'], entry['mtime_ns'] = stat.st_size, stat.st_mtime_ns
+
+        for slide in entry['slides']:
+            for asset in self.slide_assets(slide):
+                if not (self.output_dir / asset).exists():
+                    return None
+
+        print(f"Unchanged {pdf_path.name}, reusing {len(entry['slides'])} slides")
+        return entry['slides']
+
+    def record_slides(self, pdf_path, slides):
+        """Store the slides of a converted deck in the manifest and return the replaced ones"""
+        pdf_path = Path(pdf_path)
+        key = str(pdf_path.resolve())
+        presentations = self.manifest['presentations']
+
+        previous = presentations.get(key)
+        if previous and previous['slides'] is slides:
+            # Reused from the manifest, possibly built with the full settings of a --preview run
+            return []
+        stat = pdf_path.stat()
+        presentations[key] = {
+            'sha256': self.file_digest(pdf_path),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'settings': self.render_settings(),
+            'slides': slides,
+        }
+
+        return previous['slides'] if previous else []
+
+    def prune_manifest(self):
+        """Forget presentations whose source PDF is gone and delete their images"""
+        presentations = self.manifest['presentations']
+        gone = [key for key in presentations if not Path(key).exists()]
+        self.remove_assets([slide for key in gone for slide in presentations.pop(key)['slides']])
+        if gone:
+            print(f"Pruned {len(gone)} presentations whose PDF is gone")
+
+    def setup_directories(self):
+        """Create necessary directories"""
+        self.output_dir.mkdir(exist_ok=True)
+        if not self.single_file:
+            (self.output_dir / "images").mkdir(exist_ok=True)
+            (self.output_dir / "thumbnails").mkdir(exist_ok=True)
+
+    def encode_as(self, image, fmt):
+        """Encode an image in one output format and return the bytes
+
+        With fast, the encoders trade size for speed: a --preview build is
+        replaced soon anyway.
+        """
+        buffer = BytesIO()
+        if fmt == 'png':
+            image.save(buffer, 'PNG', **({'compress_level': 1} if self.fast else {'optimize': True}))
+        elif fmt == 'png8':
+            palette = image.convert('RGB').quantize(256, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+            palette.save(buffer, 'PNG', **({'compress_level': 1} if self.fast else {'optimize': True}))
+        elif fmt == 'webp':
+            image.save(buffer, 'WEBP', quality=self.quality, method=0 if self.fast else 4)
+        elif fmt == 'avif':
+            image.save(buffer, 'AVIF', quality=self.quality, **({'speed': 10} if self.fast else {}))
+        elif fmt == 'jpeg':
+            image.convert('RGB').save(buffer, 'JPEG', quality=self.quality, optimize=not self.fast, progressive=not self.fast)
+        else:
+            raise ValueError(f"Unknown image format: {fmt}")
+        return buffer.getvalue()
+
+    def _count_encode(self, fmt, data, seconds, chosen):
+        with self._stats_lock:
+            stats = self.encode_stats.setdefault(fmt, {'encoded': 0, 'bytes': 0, 'seconds': 0.0,
+                                                       'chosen': 0, 'chosen_bytes': 0, 'png_bytes': 0})
+            stats['encoded'] += 1
+            stats['bytes'] += len(data)
+            stats['seconds'] += seconds
+            if chosen:
+                stats['chosen'] += 1
+                stats['chosen_bytes'] += len(data)
+
+    def encode_image(self, image, fmt=None):
+        """Encode an image in the configured format, returning (bytes, format)
+
+        In auto mode every available candidate format is tried and the
+        smallest encoding whose PSNR against the rendered page is at least
+        min_psnr wins. Lossless PNG always qualifies, so there is a fallback.
+        """
+        fmt = (fmt or self.image_format).lower()
+        if fmt != 'auto':
+            started = time.perf_counter()
+            with self.tracer.span(fmt, 'encode', size=list(image.size)):
+                data = self.encode_as(image, fmt)
+            self._count_encode(fmt, data, time.perf_counter() - started, chosen=True)
+            return data, fmt
+
+        candidates = []
+        for candidate in AUTO_FORMATS:
+            if not format_available(candidate):
+                continue
+            started = time.perf_counter()
+            with self.tracer.span(candidate, 'encode', size=list(image.size)):
+                data = self.encode_as(image, candidate)
+            self._count_encode(candidate, data, time.perf_counter() - started, chosen=False)
+            if candidate != 'png':
+                with self.tracer.span(f"{candidate} psnr", 'encode'), Image.open(BytesIO(data)) as decoded:
+                    if psnr(image, decoded) < self.min_psnr:
+                        continue
+            candidates.append((len(data), candidate, data))
+
+        size, best, data = min(candidates)
+        png_size = next(size for size, candidate, _ in candidates if candidate == 'png')
+        with self._stats_lock:
+            stats = self.encode_stats[best]
+            stats['chosen'] += 1
+            stats['chosen_bytes'] += size
+            stats['png_bytes'] += png_size
+        return data, best
+
+    def merge_encode_stats(self, other):
+        """Add encoder statistics collected by a worker process"""
+        for fmt, values in other.items():
+            stats = self.encode_stats.setdefault(fmt, dict.fromkeys(values, 0))
+            for key, value in values.items():
+                stats[key] += value
+
+    def print_encode_report(self):
+        """Print bytes and encode time per output format"""
+        if not self.encode_stats:
+            return
+        print("\nImage encoding:")
+        print(f"  {'format':<6} {'encoded':>8} {'avg ms':>8} {'chosen':>8} {'output MB':>10}")
+        for fmt, stats in sorted(self.encode_stats.items()):
+            avg_ms = 1000 * stats['seconds'] / stats['encoded']
+            print(f"  {fmt:<6} {stats['encoded']:>8} {avg_ms:>8.1f} {stats['chosen']:>8} "
+                  f"{stats['chosen_bytes'] / (1024 * 1024):>10.2f}")
+
+        png_bytes = sum(stats['png_bytes'] for stats in self.encode_stats.values())
+        if png_bytes:
+            chosen_bytes = sum(stats['chosen_bytes'] for stats in self.encode_stats.values())
+            saved = png_bytes - chosen_bytes
+            print(f"  auto saved {saved / (1024 * 1024):.2f}MB ({100 * saved / png_bytes:.0f}%) "
+                  f"compared to optimized PNG")
+
+    def image_to_base64(self, image, format=None):
+        """Convert PIL Image to base64 data URI"""
+        img_data, fmt = self.encode_image(image, format)
+        with self.tracer.span('base64', 'base64', bytes=len(img_data)):
+            img_base64 = base64.b64encode(img_data).decode('utf-8')
+        return f"data:{IMAGE_FORMATS[fmt][1]};base64,{img_base64}"
+
+    def iter_pages(self, pdf_path, first_page=None, last_page=None):
+        """Yield (page_number, image) for the pages of a PDF, from the configured renderer
+
+        With a target width every page is rendered that many pixels wide,
+        whatever its size; otherwise at the fixed dpi.
+        """
+        fit = (self.width, None) if self.width else None
+        yield from self.renderer.pages(pdf_path, first_page, last_page, fit=fit)
+
+    def iter_thumbnails(self, pdf_path, first_page=None, last_page=None):
+        """Yield (page_number, image) for the pages of a PDF rendered at thumbnail size
+
+        Rendering straight into the thumbnail box is far cheaper than
+        shrinking a full-size page, and the rasterizer antialiases at the
+        final resolution. The images may be a pixel over the box because
+        of rounding; make_thumbnail() trims them.
+        """
+        yield from self.renderer.pages(pdf_path, first_page, last_page, fit=self.thumbnail_size)
+
+    def iter_page_pairs(self, pdf_path, first_page=None, last_page=None):
+        """Yield the items for the page pipeline of a PDF
+
+        These are (page_number, image) from iter_pages(), or with a target
+        width (page_number, image, thumbnail), with the thumbnail rendered
+        by iter_thumbnails() rather than shrunk from the image.
+        """
+        pages = self.iter_pages(pdf_path, first_page, last_page)
+        if not self.width:
+            yield from pages
+            return
+        thumbnails = self.iter_thumbnails(pdf_path, first_page, last_page)
+        try:
+            for (page_number, page), (_, thumbnail) in zip(pages, thumbnails):
+                yield page_number, page, thumbnail
+        finally:
+            pages.close()
+            thumbnails.close()
+
+    def extract_page_text(self, pdf_path, first_page=None, last_page=None):
+        """Return {page_number: text} for the text layer of a PDF, through the renderer
+
+        Whitespace is collapsed to single spaces.
+        """
+        try:
+            texts = self.renderer.page_text(pdf_path, first_page, last_page)
+        except (OSError, subprocess.CalledProcessError, *self.renderer.document_errors) as e:
+            print(f"  Could not extract text from {Path(pdf_path).name}: {e}")
+            return {}
+        return {page_number: ' '.join(text.split()) for page_number, text in texts.items()}
+
+    def make_thumbnail(self, page):
+        """Return a thumbnail-sized copy of a rendered page"""
+        with self.tracer.span('lanczos', 'thumbnail'):
+            thumbnail = page.copy()
+            thumbnail.thumbnail(self.thumbnail_size, Image.Resampling.LANCZOS)
+        return thumbnail
+
+    def convert_page(self, presentation_name, page_number, page, thumbnail=None, tiles=None):
+        """Store the full image and thumbnail of one page and return its slide entry
+
+        The thumbnail is made from the page unless it is given, and the
+        placeholder of the card from the thumbnail. If tiles is a dict, the
+        thumbnail is put in it under the page number for write_sprites()
+        instead of being written, and the entry has no thumbnail yet. With
+        dedup, a page with the same pixels as one stored before is not
+        encoded again: its entry refers to the stored copy.
+        """
+        if thumbnail is None:
+            thumbnail = self.make_thumbnail(page)
+        entry = {
+            'presentation': presentation_name,
+            'page': page_number,
+            'id': f"{presentation_name}_page_{page_number}",
+            'size': list(page.size),
+        }
+        if self.placeholders and tiles is None:
+            with self.tracer.span('placeholder', 'thumbnail', page=page_number):
+                entry['placeholder'] = placeholder_uri(thumbnail)
+        if tiles is not None:
+            tiles[page_number] = thumbnail
+            thumbnail = None
+        if self.dedup is None:
+            entry.update(self.store_page(f"{presentation_name}_page_{page_number:03d}", page, thumbnail))
+            return entry
+
+        with self.tracer.span('pixels', 'hash', page=page_number):
+            entry['hash'] = pixel_digest(page)
+            if self.dedup:
+                entry['dhash'] = f"{difference_hash(page):064x}"
+        # Identical pages are encoded once; the first to arrive stores the
+        # page and the others wait for it. Near-identical pages are matched
+        # later, by dedupe_slides(), against the stored copies.
+        with self._stats_lock:
+            stored = self.stored_pages.get(entry['hash'])
+            owner = stored is None
+            if owner:
+                stored = self.stored_pages[entry['hash']] = Future()
+        if not owner:
+            entry.update(stored.result())
+            return entry
+        try:
+            assets = self.store_page(entry['hash'], page, thumbnail)
+        except BaseException as e:
+            stored.set_exception(e)
+            raise
+        stored.set_result(assets)
+        entry.update(assets)
+        return entry
+
+    def store_page(self, stem, page, thumbnail=None):
+        """Encode a page and its thumbnail, if given, as files or data URIs and return the references
+
+        Files are named stem plus the extension of the chosen format. Dedup
+        names them by content, so copies from other processes share them.
+        """
+        if self.single_file:
+            return {'image': self.image_to_base64(page), 'thumbnail': self.image_to_base64(thumbnail)}
+
+        img_data, img_format = self.encode_image(page)
+        img_filename = f"{stem}{IMAGE_FORMATS[img_format][0]}"
+        with self.tracer.span(img_filename, 'write', bytes=len(img_data)):
+            self.write_asset(self.output_dir / "images" / img_filename, img_data)
+        assets = {'image': f"images/{img_filename}"}
+        if self.srcset:
+            assets['srcset'] = self.store_renditions(stem, page)
+
+        if thumbnail is not None:
+            thumb_data, thumb_format = self.encode_image(thumbnail)
+            thumb_filename = f"{stem}_thumb{IMAGE_FORMATS[thumb_format][0]}"
+            with self.tracer.span(thumb_filename, 'write', bytes=len(thumb_data)):
+                self.write_asset(self.output_dir / "thumbnails" / thumb_filename, thumb_data)
+            assets['thumbnail'] = f"thumbnails/{thumb_filename}"
+        return assets
+
+    def store_renditions(self, stem, page):
+        """Write the --srcset widths of a page that are smaller than the page; return [[url, width], ...]
+
+        Each is scaled down from the rendered page rather than rendered
+        again, and named stem_wWIDTH. The viewer shows the page itself where
+        none of them is wide enough.
+        """
+        renditions = []
+        for width in self.srcset:
+            if width >= page.width:
+                break
+            with self.tracer.span('lanczos', 'thumbnail', width=width):
+                image = page.resize((width, max(1, round(page.height * width / page.width))), Image.Resampling.LANCZOS)
+            data, fmt = self.encode_image(image)
+            filename = f"{stem}_w{width}{IMAGE_FORMATS[fmt][0]}"
+            with self.tracer.span(filename, 'write', bytes=len(data)):
+                self.write_asset(self.output_dir / "images" / filename, data)
+            renditions.append([f"images/{filename}", width])
+        return renditions
+
+    def write_asset(self, path, data):
+        """Write a file of the viewer through a temporary file
+
+        A browser never loads a half-written image, even while a --preview
+        build is replaced, and with dedup other processes may write the
+        same name at the same time.
+        """
+        with atomic_open(path, 'wb') as f:
+            f.write(data)
+
+    def write_sprites(self, presentation_name, slides, tiles):
+        """Pack the thumbnails of slides into atlas images
+
+        Each atlas holds up to SPRITE_TILES thumbnails, centered in cells the
+        size of the thumbnail box, and is named after its first page; a deck
+        converted in page ranges gets separate atlases per range. The slide
+        entries get the atlas as thumbnail and their cell as
+        sprite: [column, row, columns, rows].
+        """
+        width, height = self.thumbnail_size
+        for start in range(0, len(slides), SPRITE_TILES):
+            group = list(zip(slides[start:start + SPRITE_TILES], tiles[start:start + SPRITE_TILES]))
+            columns = min(len(group), SPRITE_COLUMNS)
+            rows = math.ceil(len(group) / columns)
+            with self.tracer.span('atlas', 'thumbnail', tiles=len(group)):
+                atlas = Image.new('RGB', (columns * width, rows * height), SPRITE_BACKGROUND)
+                for i, (_, tile) in enumerate(group):
+                    x, y = i % columns, i // columns
+                    atlas.paste(tile.convert('RGB'), (x * width + (width - tile.width) // 2,
+                                                      y * height + (height - tile.height) // 2))
+            data, fmt = self.encode_image(atlas)
+            filename = f"{presentation_name}_sprite_{group[0][0]['page']:03d}{IMAGE_FORMATS[fmt][0]}"
+            with self.tracer.span(filename, 'write', bytes=len(data)):
+                self.write_asset(self.output_dir / "thumbnails" / filename, data)
+            for i, (slide, _) in enumerate(group):
+                slide['thumbnail'] = f"thumbnails/{filename}"
+                slide['sprite'] = [i % columns, i // columns, columns, rows]
+
+    def sprite_style(self, slide):
+        """Inline CSS that shows a slide's cell of its sprite atlas"""
+        x, y, columns, rows = slide['sprite']
+        position_x = 100 * x / (columns - 1) if columns > 1 else 0
+        position_y = 100 * y / (rows - 1) if rows > 1 else 0
+        return (f"aspect-ratio: {self.thumbnail_size[0]} / {self.thumbnail_size[1]}; "
+                f"background-image: url('{urllib.parse.quote(slide['thumbnail'])}'); "
+                f"background-size: {columns * 100}% {rows * 100}%; "
+                f"background-position: {position_x:g}% {position_y:g}%")
+
+    def iter_slides(self, pdf_path, first_page=None, last_page=None, stage=None):
+        """Yield a record for every page of a PDF (or a page range of it) as soon as it is ready
+
+        A record is a dict with the presentation name, the PDF path, the page
+        number and size, the rendered image and its thumbnail as PIL images,
+        and the page text (None without text extraction). Records come in
+        the order pages finish, which is not necessarily page order. Nothing
+        is written: this is the entry point for feeding pages to other
+        pipelines without building a viewer.
+
+        Pages are rendered, thumbnailed and, if stage is given, passed to it
+        on threads connected by bounded queues, so only a few pages are in
+        memory at a time and a consumer that stops asking for records holds
+        up rendering. stage runs on the encode workers and returns the
+        record to yield; convert_pdf_to_images() stores pages that way.
+        Closing the generator, or leaving a for loop over it, cancels the
+        pages in flight; the first error of the pipeline is raised here.
+        """
+        pdf_path = Path(pdf_path)
+
+        def thumbnail_stage(item):
+            page_number, page, *rendered = item
+            return {
+                'presentation': pdf_path.stem,
+                'path': str(pdf_path),
+                'page': page_number,
+                'size': list(page.size),
+                'image': page,
+                'thumbnail': self.make_thumbnail(rendered[0] if rendered else page),
+                'text': None,
+            }
+
+        stages = [('thumbnail', thumbnail_stage, self.thumbnail_workers)]
+        if stage is not None:
+            stages.append(('encode', stage, self.encode_workers))
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='text') as text_pool:
+            # Text is extracted alongside rendering
+            texts = text_pool.submit(self.extract_page_text, pdf_path, first_page, last_page) if self.extract_text else None
+            pipeline = iter_pipeline(self.iter_page_pairs(pdf_path, first_page, last_page), stages, depth=self.queue_depth)
+            with contextlib.closing(pipeline):
+                for record in pipeline:
+                    if texts is not None:
+                        record['text'] = texts.result().get(record['page'], '')
+                    yield record
+
+    async def aiter_slides(self, pdf_path, first_page=None, last_page=None, stage=None):
+        """Asynchronous iter_slides(), for use from an asyncio event loop
+
+        The pipeline runs on its threads as before and records are handed
+        over one at a time, so the loop is never blocked and a slow consumer
+        still holds up rendering. Cancelling the task that iterates, or
+        closing the generator, cancels the pages in flight.
+        """
+        loop = asyncio.get_running_loop()
+        records = self.iter_slides(pdf_path, first_page, last_page, stage)
+        done = object()
+        # One thread, so that closing waits for a record still being produced
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='slides') as pool:
+            try:
+                while (record := await loop.run_in_executor(pool, next, records, done)) is not done:
+                    yield record
+            finally:
+                await asyncio.shield(loop.run_in_executor(pool, records.close))
+
+    def convert_pdf_to_images(self, pdf_path, first_page=None, last_page=None):
+        """Convert a single PDF (or a page range of it) to images and return its slide entries"""
+        pdf_path = Path(pdf_path)
+        if not pdf_path.exists() or pdf_path.suffix.lower() != '.pdf':
+            print(f"Skipping {pdf_path}: not a valid PDF file")
+            return []
+
+        if first_page is None:
+            cached = self.cached_slides(pdf_path)
+            if cached is not None:
+                return cached
+
+        page_range = f" (pages {first_page}-{last_page})" if first_page else ""
+        print(f"Processing {pdf_path.name}{page_range}...")
+
+        presentation_name = pdf_path.stem
+        tiles = {} if self.sprites else None
+
+        def convert_stage(record):
+            page_number = record['page']
+            with self.tracer.span(f"page {page_number}", 'page', pdf=pdf_path.name, page=page_number):
+                record['slide'] = self.convert_page(presentation_name, page_number, record['image'], record['thumbnail'], tiles)
+            return record
+
+        try:
+            slide_info = []
+            with self.tracer.span(pdf_path.name, 'deck', pdf=pdf_path.name, first_page=first_page, last_page=last_page):
+                for record in self.iter_slides(pdf_path, first_page, last_page, stage=convert_stage):
+                    if record['text'] is not None:
+                        record['slide']['text'] = record['text']
+                    slide_info.append(record['slide'])
+                if not slide_info:
+                    # pdf2image returns no pages when pdftoppm dies. Under the limits
+                    # of an isolated build that points at the deck; otherwise it is
+                    # as likely a broken renderer, which would fail every deck alike
+                    print(f"Error processing {pdf_path}: the renderer produced no pages")
+                    if self.timeout or self.memory_limit:
+                        self.failures[str(pdf_path.resolve())] = (
+                            'memory' if self.memory_limit else 'failed',
+                            f"the renderer produced no pages{self.limit_note()}")
+                    return []
+                slide_info.sort(key=lambda slide: slide['page'])
+
+                if tiles:
+                    self.write_sprites(presentation_name, slide_info, [tiles[slide['page']] for slide in slide_info])
+
+            print(f"  Converted {len(slide_info)} slides from {pdf_path.name}{page_range}")
+            return slide_info
+
+        except Exception as e:
+            print(f"Error processing {pdf_path}: {e}")
+            reason = self.deck_fault(e)
+            if reason:
+                self.failures[str(pdf_path.resolve())] = (reason, f"{type(e).__name__}: {e}{self.limit_note()}")
+            return []
+
+    def deck_fault(self, error):
+        """The quarantine reason for an error converting a deck, or None if the deck is not to blame
+
+        Only a broken PDF or one that needs too much memory counts; a missing
+        renderer or a full disk would fail every deck the same way.
+        """
+        if isinstance(error, MemoryError) or (isinstance(error, OSError) and error.errno == errno.ENOMEM):
+            return 'memory'
+        if isinstance(error, self.renderer.document_errors):
+            return 'failed'
+        return None
+
+    def limit_note(self):
+        """The memory limit in force, for failure details"""
+        return f" (memory limit {self.memory_limit}MB)" if self.memory_limit else ""
+
+    def process_pdfs(self, pdf_paths):
+        """Process multiple PDF files
+
+        Decks are recorded in the manifest as they complete, and the manifest
+        is saved every CHECKPOINT_SECONDS and when the build is interrupted,
+        so a build that stops half-way resumes with the decks it finished.
+        Decks that fail are quarantined and left out.
+        """
+        self.setup_directories()
+        self.manifest = self.load_manifest()
+        self.load_quarantine()
+        pdf_paths = list(dict.fromkeys(Path(p) for p in pdf_paths))
+        self.stored_pages = {}
+        self.failures = {}
+
+        skipped = [pdf_path for pdf_path in pdf_paths if self.is_quarantined(pdf_path)]
+        if skipped:
+            print(f"Skipping {len(skipped)} PDFs quarantined in {QUARANTINE_NAME} "
+                  f"(unchanged since they failed; --retry-quarantined tries them again)")
+            pdf_paths = [pdf_path for pdf_path in pdf_paths if pdf_path not in skipped]
+
+        replaced = []
+
+        def finish(pdf_path, slides):
+            """Record a converted deck, or quarantine it if it failed; return the slides to show"""
+            key = str(pdf_path.resolve())
+            if key in self.failures:
+                self.quarantine(pdf_path, *self.failures[key])
+                return []
+            if slides:
+                replaced.extend(self.record_slides(pdf_path, slides))
+                if self.quarantined.pop(key, None):
+                    self.save_quarantine()
+                self.checkpoint()
+            return slides
+
+        try:
+            if self.timeout or self.memory_limit:
+                results = self.process_pdfs_isolated(pdf_paths, finish)
+            elif self.jobs > 1:
+                results = self.process_pdfs_parallel(pdf_paths, finish)
+            else:
+                results = [finish(pdf_path, self.convert_pdf_to_images(pdf_path)) for pdf_path in pdf_paths]
+        except KeyboardInterrupt:
+            self.save_manifest()
+            print(f"\nInterrupted: the decks finished so far are saved in {MANIFEST_NAME}, "
+                  f"a new run continues from there")
+            raise
+
+        for slides in results:
+            self.slides_data.extend(slides)
+
+        # Images of pages that no longer exist, e.g. when a deck got shorter,
+        # are dropped after index.html is replaced (remove_stale_assets)
+        self.stale_assets.update(asset for slide in replaced for asset in self.slide_assets(slide))
+        self.prune_manifest()
+        if self.dedup is not None:
+            self.dedupe_slides(self.slides_data)
+        if self.shard:
+            self.manifest['shard'] = self.shard
+        else:
+            self.manifest.pop('shard', None)
+        self.save_manifest()
+        self.update_catalog(self.manifest['presentations'])
+        self.print_encode_report()
+        if self.failures:
+            print(f"Quarantined {len(self.failures)} PDFs that failed this run, "
+                  f"see {self.output_dir / QUARANTINE_NAME}")
+
+    def checkpoint(self):
+        """Save the manifest if the last save is CHECKPOINT_SECONDS old"""
+        if time.monotonic() - self.last_checkpoint >= CHECKPOINT_SECONDS:
+            self.save_manifest()
+            self.last_checkpoint = time.monotonic()
+
+    def load_quarantine(self):
+        """Load the quarantined PDFs of the output directory"""
+        try:
+            with open(self.output_dir / QUARANTINE_NAME, encoding='utf-8') as f:
+                self.quarantined = json.load(f)
+        except FileNotFoundError:
+            self.quarantined = {}
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable {QUARANTINE_NAME}: {e}")
+            self.quarantined = {}
+
+    def save_quarantine(self):
+        """Write the quarantine report atomically, or remove it once it is empty"""
+        path = self.output_dir / QUARANTINE_NAME
+        if not self.quarantined:
+            path.unlink(missing_ok=True)
+            return
+        with atomic_open(path) as f:
+            json.dump(self.quarantined, f, indent=2, ensure_ascii=False)
+
+    def quarantine(self, pdf_path, reason, detail):
+        """Report a deck that failed and keep it in quarantine.json
+
+        An earlier build of the deck is dropped from the manifest, and its
+        images along with the other stale assets.
+        """
+        pdf_path = Path(pdf_path)
+        key = str(pdf_path.resolve())
+        try:
+            stat = pdf_path.stat()
+            size, mtime_ns = stat.st_size, stat.st_mtime_ns
+        except OSError:
+            size = mtime_ns = None
+        self.quarantined[key] = {
+            'reason': reason,
+            'detail': detail,
+            'size': size,
+            'mtime_ns': mtime_ns,
+            # A --preview pass fails for the build it stands in for
+            'settings': self.final_settings or self.render_settings(),
+            'timeout': self.timeout,
+            'memory_limit': self.memory_limit,
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        self.save_quarantine()
+        previous = self.manifest['presentations'].pop(key, None)
+        if previous:
+            self.stale_assets.update(asset for slide in previous['slides'] for asset in self.slide_assets(slide))
+        print(f"  Quarantined {pdf_path.name} ({reason}): {detail}")
+
+    def is_quarantined(self, pdf_path):
+        """Whether a PDF failed before and neither it nor the settings it failed with have changed since
+
+        Settings include the renderer, the timeout and the memory limit, so
+        a deck that timed out is tried again with a longer timeout.
+        """
+        entry = self.quarantined.get(str(Path(pdf_path).resolve()))
+        if entry is None or self.retry_quarantined:
+            return False
+        try:
+            stat = Path(pdf_path).stat()
+        except OSError:
+            return False
+        return ((entry['size'], entry['mtime_ns']) == (stat.st_size, stat.st_mtime_ns)
+                and entry.get('settings') in (self.render_settings(), self.final_settings)
+                and (entry.get('timeout'), entry.get('memory_limit')) == (self.timeout, self.memory_limit))
+
+    def dedupe_slides(self, slides):
+        """Point duplicate slides at the first stored copy and report what sharing saves
+
+        Identical pages converted by one process share their files already;
+        this pass also joins those from different worker processes, cached
+        decks and shards. With a dedup distance, pages whose dHashes are that
+        close are compared on their stored thumbnails and joined if no pixel
+        differs by more than NEAR_DUPLICATE_TOLERANCE. Files no slide refers
+        to any more are deleted along with the other stale assets.
+        """
+        index = DuplicateIndex(self.dedup)
+        previews = {}
+        replaced = []
+        exact = similar = saved = 0
+        for slide in slides:
+            if 'hash' not in slide:
+                continue
+            dhash = int(slide['dhash'], 16) if 'dhash' in slide else None
+            first = index.find(slide['hash'], slide['size'], dhash,
+                               accept=lambda other: self.near_duplicate(slide, other, previews))
+            if first is None:
+                index.add(slide['hash'], slide['size'], dhash, slide)
+                continue
+            # Sprite atlases are per deck, so only the full image is shared
+            for key in ('image',) if 'sprite' in slide else ('image', 'thumbnail'):
+                if slide[key] != first[key]:
+                    replaced.append(slide[key])
+                    slide[key] = first[key]
+                saved += self.asset_size(first[key])
+            if 'srcset' in first:
+                replaced.extend(url for url, _ in slide.get('srcset', ()) if url not in dict(first['srcset']))
+                slide['srcset'] = first['srcset']
+                saved += sum(self.asset_size(url) for url, _ in first['srcset'])
+            if slide['hash'] == first['hash']:
+                exact += 1
+            else:
+                similar += 1
+
+        if not self.single_file:
+            self.stale_assets.update(replaced)
+
+        if exact or similar:
+            print(f"Duplicates: {exact + similar} of {len(slides)} slides share stored images "
+                  f"({exact} identical, {similar} near-identical), saving {saved / (1024 * 1024):.1f}MB")
+        else:
+            print(f"Duplicates: none among {len(slides)} slides")
+
+    def near_duplicate(self, slide, other, previews):
+        """Whether two slides look the same, judged on their stored thumbnails
+
+        Decoded thumbnails are kept in previews, as a page tends to be
+        compared with several others.
+        """
+        def preview(slide):
+            asset = slide['image'] if 'sprite' in slide else slide['thumbnail']
+            if asset not in previews:
+                if asset.startswith('data:'):
+                    source = BytesIO(base64.b64decode(asset.split(',', 1)[1]))
+                else:
+                    source = self.output_dir / asset
+                try:
+                    with Image.open(source) as image:
+                        image = image.convert('L')
+                        image.thumbnail(self.thumbnail_size, Image.Resampling.BOX)
+                        previews[asset] = image
+                except OSError:
+                    previews[asset] = None
+            return previews[asset]
+
+        a, b = preview(slide), preview(other)
+        if a is None or b is None:
+            return False
+        if a.size != b.size:
+            b = b.resize(a.size, Image.Resampling.BOX)
+        return ImageChops.difference(a, b).getextrema()[1] <= NEAR_DUPLICATE_TOLERANCE
+
+    def asset_size(self, asset):
+        """Size in bytes of a stored image: its file, or the data a data URI holds"""
+        if asset.startswith('data:'):
+            return len(asset) * 3 // 4
+        path = self.output_dir / asset
+        return path.stat().st_size if path.exists() else 0
+
+    def update_catalog(self, presentations):
+        """Bring catalog.sqlite in the output directory in line with manifest entries"""
+        try:
+            catalog = SlideCatalog(self.output_dir / CATALOG_NAME)
+        except sqlite3.Error as e:
+            # e.g. an SQLite built without FTS5
+            print(f"Warning: cannot write {CATALOG_NAME}: {e}")
+            return
+        try:
+            with self.tracer.span('catalog', 'write'):
+                rewritten = catalog.update(presentations)
+            decks, slides = catalog.counts()
+        finally:
+            catalog.close()
+        print(f"Catalog: {decks} presentations, {slides} slides ({rewritten} updated) in {CATALOG_NAME}")
+
+    def rebuild(self, pdf_paths, changed=()):
+        """Bring the viewer up to date after some source PDFs changed
+
+        Unchanged decks are taken from the build manifest, so only the
+        changed files are rendered before index.html is replaced.
+        """
+        for pdf_path in changed:
+            self._digests.pop(str(Path(pdf_path).resolve()), None)
+        self.slides_data = []
+        self.encode_stats = {}
+        self.process_pdfs(pdf_paths)
+        if self.slides_data:
+            self.generate_html_viewer()
+        else:
+            self.remove_stale_assets()
+            print("No slides were processed successfully!")
+
+    def select_shard(self, pdf_paths, index, count):
+        """Return the PDFs that belong to shard index (1-based) of count
+
+        A PDF's shard follows from the CRC-32 of its file name, so every
+        machine picks the same subset whatever the mount point. Positions in
+        the full list are saved in the manifest for merge_shards().
+        """
+        pdf_paths = list(dict.fromkeys(Path(p) for p in pdf_paths))
+        positions = {}
+        for position, pdf_path in enumerate(pdf_paths):
+            if zlib.crc32(pdf_path.name.encode('utf-8')) % count == index - 1:
+                positions[str(pdf_path.resolve())] = position
+        self.shard = {'index': index, 'count': count, 'positions': positions}
+        return [pdf_path for pdf_path in pdf_paths if str(pdf_path.resolve()) in positions]
+
+    def merge_shards(self, shard_dirs):
+        """Collect the slides of --shard builds, linking their images into the output
+
+        Nothing is rendered: slide entries come from the manifests of the
+        shard output directories and are put back in the order of the full
+        input list. Images are hard-linked where possible and copied
+        otherwise. The layout (single file or not, thumbnail size) follows
+        the shards.
+        """
+        decks = []
+        shards = {}
+        for shard_dir in map(Path, shard_dirs):
+            manifest = self.load_manifest(shard_dir)
+            shard = manifest.get('shard')
+            if not shard:
+                print(f"Skipping {shard_dir}: not a --shard build")
+                continue
+            if shard['index'] in shards:
+                print(f"Warning: shard {shard['index']}/{shard['count']} given twice, "
+                      f"from {shards[shard['index']][0]} and {shard_dir}")
+            shards[shard['index']] = (shard_dir, shard['count'])
+            for key, position in shard['positions'].items():
+                entry = manifest['presentations'].get(key)
+                if entry is None:
+                    print(f"Warning: {Path(key).name} failed in {shard_dir}, leaving it out")
+                    continue
+                decks.append((position, shard_dir, key, entry))
+
+        counts = {count for _, count in shards.values()}
+        missing = sorted(set(range(1, max(counts, default=0) + 1)) - shards.keys())
+        if len(counts) > 1:
+            print(f"Warning: shards were built with different shard counts: {sorted(counts)}")
+        if missing:
+            print(f"Warning: shards {', '.join(map(str, missing))} are missing; their decks will not be listed")
+        if not decks:
+            return
+
+        settings = decks[0][3]['settings']
+        if any(entry['settings'] != settings for _, _, _, entry in decks):
+            print("Warning: shards were rendered with different settings")
+        self.single_file = settings['single_file']
+        self.thumbnail_size = tuple(settings['thumbnail_size'])
+        self.sprites = settings.get('sprites', False)
+        self.dedup = settings.get('dedup')
+        self.setup_directories()
+
+        linked = set()
+        merged = {}
+        for _, shard_dir, key, entry in sorted(decks, key=lambda deck: deck[0]):
+            for slide in entry['slides']:
+                for asset in self.slide_assets(slide):
+                    if asset not in linked:
+                        linked.add(asset)
+                        try:
+                            self.link_asset(shard_dir / asset, self.output_dir / asset)
+                        except OSError as e:
+                            print(f"Warning: cannot take {asset} from {shard_dir}: {e}")
+            self.slides_data.extend(entry['slides'])
+            merged[key] = entry
+        print(f"Merged {len(decks)} presentations from {len(shards)} shards, {len(linked)} image files")
+        if self.dedup is not None:
+            self.dedupe_slides(self.slides_data)
+        self.update_catalog(merged)
+
+    def link_asset(self, source, target):
+        """Hard-link (or copy) an image into place, replacing an older file"""
+        if target.exists() and os.path.samefile(source, target):
+            return
+        with replacing(target) as tmp_path:
+            try:
+                os.link(source, tmp_path)
+            except OSError:
+                shutil.copy2(source, tmp_path)
+
+    def plan_tasks(self, pdf_paths):
+        """Split PDFs into (pdf_path, first_page, last_page) work units
+
+        Large decks are cut into page ranges so that a single long deck does
+        not keep one worker busy while the others sit idle. Tasks are returned
+        in document order, which is also the order of the resulting slides.
+        """
+        page_counts = []
+        for pdf_path in pdf_paths:
+            try:
+                page_counts.append(self.renderer.page_count(pdf_path))
+            except Exception:
+                # Let the worker report the error for unreadable files
+                page_counts.append(None)
+
+        total_pages = sum(count for count in page_counts if count)
+        chunk = max(MIN_PAGES_PER_TASK, math.ceil(total_pages / (self.jobs * 4)))
+
+        tasks = []
+        for pdf_path, count in zip(pdf_paths, page_counts):
+            if not count or count <= chunk:
+                tasks.append((pdf_path, None, None))
+                continue
+            for first_page in range(1, count + 1, chunk):
+                tasks.append((pdf_path, first_page, min(first_page + chunk - 1, count)))
+        return tasks
+
+    def process_pdfs_parallel(self, pdf_paths, finish):
+        """Process PDFs on a pool of worker processes, returning slides per PDF
+
+        finish(pdf_path, slides) is called as each deck is complete and
+        returns the slides to keep. A deck with a page range that failed is
+        passed on without slides, so that it is not recorded with pages
+        missing and the next run renders it again.
+        """
+        results = [self.cached_slides(pdf_path) for pdf_path in pdf_paths]
+        pending = [pdf_path for pdf_path, slides in zip(pdf_paths, results) if slides is None]
+        if not pending:
+            return results
+
+        tasks = self.plan_tasks(pending)
+        print(f"Rendering {len(tasks)} tasks on {self.jobs} processes")
+
+        rendered = {}
+        incomplete = set()
+        remaining = Counter(pdf_path for pdf_path, _, _ in tasks)
+        kwargs = self.worker_kwargs()
+        with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+            futures = [executor.submit(_convert_task, kwargs, *task) for task in tasks]
+            # Collect in submission order so slide order does not depend on scheduling
+            for (pdf_path, _, _), future in zip(tasks, futures):
+                slides, encode_stats, trace_events, failures = future.result()
+                rendered.setdefault(pdf_path, []).extend(slides)
+                if not slides:
+                    # Every range has pages, so an empty one failed
+                    incomplete.add(pdf_path)
+                self.merge_encode_stats(encode_stats)
+                self.tracer.events.extend(trace_events)
+                self.failures.update(failures)
+                remaining[pdf_path] -= 1
+                if not remaining[pdf_path]:
+                    if pdf_path in incomplete and rendered[pdf_path]:
+                        print(f"Leaving out {pdf_path.name}: some of its pages failed, the next run renders it again")
+                        rendered[pdf_path] = []
+                    rendered[pdf_path] = finish(pdf_path, rendered[pdf_path])
+
+        return [slides if slides is not None else rendered.get(pdf_path, [])
+                for pdf_path, slides in zip(pdf_paths, results)]
+
+    def process_pdfs_isolated(self, pdf_paths, finish):
+        """Process PDFs each in a child process of its own, under the timeout and memory limit
+
+        Up to jobs children run at a time; decks are not split into page
+        ranges, so the timeout is per document. A child that runs out of
+        time is killed together with the renderer it started, and its deck
+        is quarantined like one whose child crashed or ran out of memory.
+        finish(pdf_path, slides) is called as each deck is done and returns
+        the slides to keep.
+        """
+        results = [self.cached_slides(pdf_path) for pdf_path in pdf_paths]
+        pending = deque((index, pdf_path) for index, (pdf_path, slides) in enumerate(zip(pdf_paths, results))
+                        if slides is None)
+        if not pending:
+            return results
+
+        limits = [f"{self.timeout:g}s" if self.timeout else None, f"{self.memory_limit}MB" if self.memory_limit else None]
+        print(f"Rendering {len(pending)} PDFs in isolated processes, {self.jobs} at a time "
+              f"(limit {' and '.join(filter(None, limits))} each)")
+
+        kwargs = self.worker_kwargs()
+        running = {}  # result connection -> (index, pdf_path, process, deadline)
+        try:
+            while pending or running:
+                while pending and len(running) < self.jobs:
+                    index, pdf_path = pending.popleft()
+                    receiver, sender = multiprocessing.Pipe(duplex=False)
+                    process = multiprocessing.Process(target=_isolated_task, name=f"convert-{pdf_path.name}",
+                                                      args=(sender, kwargs, pdf_path, self.memory_limit), daemon=True)
+                    process.start()
+                    sender.close()
+                    deadline = time.monotonic() + self.timeout if self.timeout else None
+                    running[receiver] = (index, pdf_path, process, deadline)
+
+                deadlines = [deadline for *_, deadline in running.values() if deadline is not None]
+                wait = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+                for receiver in multiprocessing.connection.wait(list(running), wait):
+                    index, pdf_path, process, _ = running.pop(receiver)
+                    try:
+                        slides, encode_stats, trace_events, failures = receiver.recv()
+                        process.join()
+                    except (EOFError, OSError):
+                        # It died without a result: crashed, or killed for its memory use
+                        process.join()
+                        slides, encode_stats, trace_events = [], {}, []
+                        failures = {str(pdf_path.resolve()): self.describe_exit(process.exitcode)}
+                    receiver.close()
+                    self.merge_encode_stats(encode_stats)
+                    self.tracer.events.extend(trace_events)
+                    self.failures.update(failures)
+                    results[index] = finish(pdf_path, slides)
+
+                now = time.monotonic()
+                for receiver, (index, pdf_path, process, deadline) in list(running.items()):
+                    if deadline is not None and now >= deadline:
+                        del running[receiver]
+                        self.kill_process_group(process)
+                        receiver.close()
+                        print(f"  {pdf_path.name} took longer than {self.timeout:g}s, stopped")
+                        self.failures[str(pdf_path.resolve())] = ('timeout', f"not converted within {self.timeout:g}s")
+                        results[index] = finish(pdf_path, [])
+        finally:
+            for receiver, (_, _, process, _) in running.items():
+                self.kill_process_group(process)
+                receiver.close()
+
+        return results
+
+    @staticmethod
+    def kill_process_group(process):
+        """Kill an isolated worker and everything it started"""
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            process.kill()  # it has not made a process group of its own yet
+        process.join()
+
+    def describe_exit(self, exitcode):
+        """(reason, detail) for an isolated worker that ended without a result, from its exit code
+
+        Under a memory limit, running out of memory is the likely cause of
+        any abnormal end: allocation failures surface as anything from a
+        MemoryError to a failed exec.
+        """
+        if exitcode == OUT_OF_MEMORY_EXIT:
+            return 'memory', f"worker ran out of memory{self.limit_note()}"
+        if exitcode is None or exitcode >= 0:
+            detail = f"worker exited with status {exitcode}"
+        else:
+            try:
+                detail = f"worker killed by {signal.Signals(-exitcode).name}"
+            except ValueError:
+                detail = f"worker killed by signal {-exitcode}"
+        return ('memory' if self.memory_limit else 'crashed'), detail + self.limit_note()
+
+    def group_presentations(self):
+        """Group slides by presentation, keeping their order"""
+        presentations = {}
+        for slide in self.slides_data:
+            presentations.setdefault(slide['presentation'], []).append(slide)
+        return presentations
+
+    def viewer_entry(self, slide):
+        """The part of a slide entry the viewer script needs
+
+        Thumbnails are only referenced from the card markup, so they are left
+        out; in single-file mode this avoids embedding every thumbnail twice.
+        """
+        return {key: slide[key] for key in ('presentation', 'page', 'image', 'id')} | self.srcset_entry(slide)
+
+    @staticmethod
+    def srcset_entry(slide):
+        """The smaller renditions of a slide and its page size, which the modal picks from, if it has any"""
+        return {'srcset': slide['srcset'], 'size': slide['size']} if slide.get('srcset') else {}
+
+    def write_json_array(self, f, items):
+        """Write items as a compact JSON array that is safe inside a script tag"""
+        f.write('[')
+        for i, item in enumerate(items):
+            if i:
+                f.write(',')
+            f.write(json.dumps(item, separators=(',', ':')).replace('</', '<\\/'))
+        f.write(']')
+
+    def generate_html_viewer(self):
+        """Generate the HTML viewer
+
+        The page is streamed into a temporary file that then replaces
+        index.html, so memory use stays flat and a reader never sees a
+        half-written viewer.
+        """
+        html_path = self.output_dir / "index.html"
+        presentations = self.group_presentations()
+        # Slides are numbered in display order, which the search index refers to
+        with self.tracer.span('search index', 'html'):
+            search_index = build_search_index([slide for slides in presentations.values() for slide in slides])
+            search_json = json.dumps(search_index, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+
+        with self.tracer.span(html_path.name, 'html', slides=len(self.slides_data)), atomic_open(html_path) as f:
+            if self.lazy:
+                self.write_lazy_viewer(f, self.write_chunks(presentations), self.write_search_index(search_json))
+            else:
+                self.write_html_viewer(f, presentations, search_json)
+        self.remove_stale_assets()
+
+        print(f"\nHTML viewer generated: {html_path}")
+        print(f"Total slides processed: {len(self.slides_data)}")
+        print(f"Search index: {len(search_index['terms'])} terms, {len(search_json.encode('utf-8')) / 1024:.0f}KB")
+
+        if not self.single_file:
+            thumbnails = {slide['thumbnail'] for slide in self.slides_data}
+            thumbnail_paths = [self.output_dir / path for path in thumbnails]
+            thumbnail_bytes = sum(path.stat().st_size for path in thumbnail_paths if path.exists())
+            print(f"Thumbnails: {len(thumbnails)} files, {thumbnail_bytes / (1024 * 1024):.1f}MB "
+                  f"for {len(self.slides_data)} slides{' (sprite atlases)' if self.sprites else ''}")
+
+        if self.single_file:
+            file_size = html_path.stat().st_size / (1024 * 1024)
+            print(f"Single file size: {file_size:.1f}MB")
+            print(f"Self-contained HTML file ready for sharing!")
+        elif self.lazy:
+            file_size = html_path.stat().st_size / 1024
+            print(f"Lazy viewer: {file_size:.0f}KB bootstrap page, {len(presentations)} slide chunks")
+        else:
+            print(f"Multi-file viewer with separate image assets")
+
+        print(f"Open {html_path} in your browser to view slides")
+
+    def write_page_head(self, f, title, heading, slide_count, presentation_count):
+        """Write the page from the doctype up to the opening of the slide container"""
+        f.write(f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{title}</title>
+    <style>{VIEWER_CSS}    </style>
+</head>
+<body>
+    <div class="header">
+        <h1>{heading}</h1>
+        <div class="controls">
+            <input type="text" class="search-box" placeholder="Search presentations or slides..." id="searchBox">
+            <div class="view-toggle">
+                <button class="view-btn active" data-view="grid">Grid</button>
+                <button class="view-btn" data-view="list">List</button>
+            </div>
+            <div class="stats">
+                <span id="slideCount">{slide_count}</span> slides from
+                <span id="presentationCount">{presentation_count}</span> presentations
+                <span id="searchInfo"></span>
+            </div>
+        </div>
+    </div>
+
+    <div class="container">
+""")
+
+    def write_chunks(self, presentations):
+        """Write one slide chunk script per presentation for the lazy viewer
+
+        Returns the bootstrap index: name, slide count and chunk URL of every
+        presentation. Chunk URLs carry a content hash so that browsers do
+        not mix cached chunks from an earlier build.
+        """
+        chunk_dir = self.output_dir / "chunks"
+        chunk_dir.mkdir(exist_ok=True)
+
+        index = []
+        written = set()
+        for number, (pres_name, slides) in enumerate(presentations.items()):
+            entries = [{key: slide[key] for key in ('page', 'image', 'thumbnail', 'id', 'sprite', 'placeholder') if key in slide}
+                       | self.srcset_entry(slide) for slide in slides]
+            content = f"slideviewChunk({number},{json.dumps(entries, separators=(',', ':'))});\n"
+            filename = f"{number:04d}.js"
+            chunk_path = chunk_dir / filename
+            if not chunk_path.exists() or chunk_path.read_text(encoding='utf-8') != content:
+                self.write_asset(chunk_path, content.encode('utf-8'))
+            written.add(filename)
+
+            version = hashlib.sha1(content.encode('utf-8')).hexdigest()[:10]
+            index.append({'name': pres_name, 'count': len(slides), 'chunk': f"chunks/{filename}?v={version}"})
+
+        for stale in chunk_dir.glob('*.js'):
+            if stale.name not in written:
+                stale.unlink()
+        return index
+
+    def write_search_index(self, search_json):
+        """Write the search index script of the lazy viewer and return its URL"""
+        content = f"slideviewSearchIndex({search_json});\n"
+        self.write_asset(self.output_dir / "search-index.js", content.encode('utf-8'))
+        version = hashlib.sha1(content.encode('utf-8')).hexdigest()[:10]
+        return f"search-index.js?v={version}"
+
+    def write_lazy_viewer(self, f, index, search_index_url):
+        """Write the bootstrap page of the lazy viewer to an open file"""
+        total_slides = sum(entry['count'] for entry in index)
+        self.write_page_head(f, "PDF Slide Viewer", "PDF Slide Viewer", total_slides, len(index))
+        f.write(f"""        <div id="virtualGrid" class="virtual-grid"></div>
+    </div>
+
+    {VIEWER_MODAL}
+
+    <script>
+        // Presentation index; slides are loaded per presentation from chunks/
+        const presentations = """)
+        self.write_json_array(f, index)
+        f.write(f""";
+        const thumbAspect = {self.thumbnail_size[1] / self.thumbnail_size[0]:.4f};
+        const searchIndexUrl = {json.dumps(search_index_url)};
+{SEARCH_SCRIPT}{MODAL_IMAGE_SCRIPT}{LAZY_VIEWER_SCRIPT}    </script>
+</body>
+</html>""")
+
+    def thumbnail_markup(self, slide, source=None):
+        """The thumbnail element of a slide card
+
+        source replaces the src attribute, for single-file pages that fill in
+        their thumbnails by script. A slide's placeholder is the background
+        of the element until the thumbnail has loaded; the element takes the
+        page's aspect ratio, so the grid is laid out before any thumbnail
+        arrives.
+        """
+        if 'sprite' in slide:
+            return (f'<div class="slide-image slide-sprite" role="img" aria-label="Slide {slide["page"]}" '
+                    f'style="{html.escape(self.sprite_style(slide))}"></div>')
+        source = source or f'src="{html.escape(slide["thumbnail"])}"'
+        if not slide.get('placeholder'):
+            return f'<img {source} alt="Slide {slide["page"]}" class="slide-image" loading="lazy">'
+        width, height = slide['size']
+        style = f"aspect-ratio: {width} / {height}; background-image: url({slide['placeholder']})"
+        return f'<img {source} alt="Slide {slide["page"]}" class="slide-image slide-lqip" loading="lazy" style="{html.escape(style)}">'
+
+    def write_html_viewer(self, f, presentations, search_json):
+        """Write the viewer page to an open file"""
+        # Calculate approximate file size for single file mode
+        file_size_info = ""
+        if self.single_file:
+            total_chars = sum(map(len, {slide[key] for slide in self.slides_data for key in ('image', 'thumbnail')}))
+            estimated_mb = (total_chars * 0.75) / (1024 * 1024)  # Base64 is ~4/3 larger than binary
+            file_size_info = f" (Estimated size: ~{estimated_mb:.1f}MB)"
+
+        self.write_page_head(f, f"PDF Slide Viewer{file_size_info}",
+                             f"PDF Slide Viewer{'' if not self.single_file else ' (Single File)'}",
+                             len(self.slides_data), len(presentations))
+        f.write("""        <div id="presentationsContainer">
+""")
+
+        # In single-file mode every distinct image is embedded once, after
+        # the cards, so that the grid paints with its placeholders first:
+        # cards index into thumbnailImages, slides into slideImages.
+        thumbnails = {}
+
+        # Generate presentation sections
+        for pres_name, slides in presentations.items():
+            name = html.escape(pres_name)
+            f.write(f"""
+            <div class="presentation-section" data-presentation="{name}">
+                <div class="presentation-title">{name} ({len(slides)} slides)</div>
+                <div class="slides-grid" id="slides-{name.replace(' ', '_')}">
+""")
+
+            for slide in slides:
+                if self.single_file:
+                    number = thumbnails.setdefault(slide['thumbnail'], len(thumbnails))
+                    thumbnail = self.thumbnail_markup(slide, f'data-thumbnail="{number}"')
+                else:
+                    thumbnail = self.thumbnail_markup(slide)
+                f.write(f"""
+                    <div class="slide-card" data-slide-id="{html.escape(slide['id'])}" data-presentation="{name}" data-page="{slide['page']}">
+                        {thumbnail}
+                        <div class="slide-info">
+                            Page {slide['page']}
+                        </div>
+                    </div>
+""")
+
+            f.write("""
+                </div>
+            </div>
+""")
+
+        f.write(f"""
+        </div>
+    </div>
+
+    {VIEWER_MODAL}
+
+    <script>
+        // Slide data, in the order of the cards
+        const slidesData = """)
+        entries = [self.viewer_entry(slide) for slides in presentations.values() for slide in slides]
+        images = {}
+        if self.single_file:
+            for entry in entries:
+                entry['image'] = images.setdefault(entry['image'], len(images))
+        self.write_json_array(f, entries)
+        f.write(""";
+        const slideImages = """)
+        self.write_json_array(f, images)
+        f.write(""";
+        const thumbnailImages = """)
+        self.write_json_array(f, thumbnails)
+        f.write(f""";
+        const searchIndex = {search_json};
+{SEARCH_SCRIPT}{MODAL_IMAGE_SCRIPT}
+        let currentSlideIndex = 0;
+        let filteredSlides = [...slidesData];
+
+        // Elements
+        const searchBox = document.getElementById('searchBox');
+        const presentationsContainer = document.getElementById('presentationsContainer');
+        const slideModal = document.getElementById('slideModal');
+        const modalImage = document.getElementById('modalImage');
+        const modalInfo = document.getElementById('modalInfo');
+        const modalClose = document.getElementById('modalClose');
+        const modalPrev = document.getElementById('modalPrev');
+        const modalNext = document.getElementById('modalNext');
+        const viewButtons = document.querySelectorAll('.view-btn');
+
+        // Search functionality; cards are collected once, slide text is looked up in the index
+        const slideCards = Array.from(document.querySelectorAll('.slide-card'));
+        const slideSections = slideCards.map(card => card.closest('.presentation-section'));
+        const sections = Array.from(new Set(slideSections));
+        const searchInfo = document.getElementById('searchInfo');
+
+        searchBox.addEventListener('input', function() {{
+            const query = this.value.toLowerCase().trim();
+            const started = performance.now();
+            const textMatches = searchSlides(searchIndex, query);
+            const visibleSections = new Set();
+            let matchCount = 0;
+
+            slideCards.forEach((card, index) => {{
+                const slide = slidesData[index];
+                const isVisible = !query || `${{slide.presentation}} page ${{slide.page}}`.toLowerCase().includes(query)
+                    || (textMatches !== null && textMatches.has(index));
+                card.classList.toggle('hidden', !isVisible);
+                if (isVisible) {{
+                    visibleSections.add(slideSections[index]);
+                    matchCount++;
+                }}
+            }});
+            sections.forEach(section => section.classList.toggle('hidden', !visibleSections.has(section)));
+
+            const elapsed = performance.now() - started;
+            searchInfo.textContent = query ? `(${{matchCount}} matches, ${{elapsed.toFixed(1)}} ms)` : '';
+        }});
+
+        // View toggle
+        viewButtons.forEach(btn => {{
+            btn.addEventListener('click', function() {{
+                viewButtons.forEach(b => b.classList.remove('active'));
+                this.classList.add('active');
+
+                const view = this.dataset.view;
+                const grids = document.querySelectorAll('.slides-grid');
+
+                grids.forEach(grid => {{
+                    grid.className = view === 'list' ? 'slides-list' : 'slides-grid';
+                }});
+
+                document.body.className = view === 'list' ? 'list-view' : '';
+            }});
+        }});
+
+        // Modal functionality
+        function openModal(slideId) {{
+            const slideIndex = slidesData.findIndex(s => s.id === slideId);
+            if (slideIndex === -1) return;
+
+            currentSlideIndex = slideIndex;
+            showSlide(slideIndex);
+            slideModal.style.display = 'block';
+            document.body.style.overflow = 'hidden';
+        }}
+
+        function closeModal() {{
+            slideModal.style.display = 'none';
+            document.body.style.overflow = '';
+        }}
+
+        // Single-file slides refer to their image by its position in slideImages
+        function imageUrl(slide) {{
+            return typeof slide.image === 'number' ? slideImages[slide.image] : slide.image;
+        }}
+
+        function showSlide(index) {{
+            const slide = slidesData[index];
+            const count = slidesData.length;
+            showImages(nearbyOffsets().map(d => {{
+                const nearby = slidesData[((index + d) % count + count) % count];
+                return renditionUrl(nearby, imageUrl(nearby));
+            }}));
+            modalImage.alt = `${{slide.presentation}} - Page ${{slide.page}}`;
+            modalInfo.textContent = `${{slide.presentation}} - Page ${{slide.page}} of ${{slidesData.filter(s => s.presentation === slide.presentation).length}}`;
+        }}
+
+        function nextSlide() {{
+            currentSlideIndex = (currentSlideIndex + 1) % slidesData.length;
+            showSlide(currentSlideIndex);
+        }}
+
+        function prevSlide() {{
+            currentSlideIndex = (currentSlideIndex - 1 + slidesData.length) % slidesData.length;
+            showSlide(currentSlideIndex);
+        }}
+
+        // Event listeners
+        document.addEventListener('click', function(e) {{
+            if (e.target.closest('.slide-card')) {{
+                const slideCard = e.target.closest('.slide-card');
+                openModal(slideCard.dataset.slideId);
+            }}
+        }});
+
+        modalClose.addEventListener('click', closeModal);
+        modalPrev.addEventListener('click', prevSlide);
+        modalNext.addEventListener('click', nextSlide);
+
+        slideModal.addEventListener('click', function(e) {{
+            if (e.target === slideModal) {{
+                closeModal();
+            }}
+        }});
+
+        // Keyboard navigation
+        document.addEventListener('keydown', function(e) {{
+            if (slideModal.style.display === 'block') {{
+                switch(e.key) {{
+                    case 'Escape':
+                        closeModal();
+                        break;
+                    case 'ArrowLeft':
+                        prevSlide();
+                        break;
+                    case 'ArrowRight':
+                        nextSlide();
+                        break;
+                }}
+            }}
+        }});
+
+        // Initialize
+        document.querySelectorAll('img[data-thumbnail]').forEach(img => {{
+            img.src = thumbnailImages[img.dataset.thumbnail];
+        }});
+    </script>
+</body>
+</html>""")
+
+
+def read_url_list(path):
+    """Read URLs from a file (or stdin for '-'), one per line; blank lines and # comments are ignored"""
+    if path == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        lines = Path(path).read_text(encoding='utf-8').splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.lstrip().startswith('#')]
+
+
+class PDFFetcher:
+    """Download a list of PDF URLs concurrently into a local directory
+
+    Transfers run on asyncio with a bounded aiohttp connection pool. The
+    ETag and Last-Modified headers of every download are kept in a cache
+    file next to the PDFs, so re-runs send conditional requests and only
+    transfer files that changed. Incomplete downloads are kept as .part
+    files and resumed with a Range request guarded by If-Range.
+    """
+
+    def __init__(self, download_dir, connections=8, retries=3):
+        self.download_dir = Path(download_dir)
+        self.connections = connections
+        self.retries = retries
+        self.cache_path = self.download_dir / FETCH_CACHE_NAME
+        self.cache = {}
+
+    def load_cache(self):
+        try:
+            with open(self.cache_path, encoding='utf-8') as f:
+                self.cache = json.load(f)
+        except FileNotFoundError:
+            self.cache = {}
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable {FETCH_CACHE_NAME}: {e}")
+            self.cache = {}
+
+    def save_cache(self):
+        with atomic_open(self.cache_path) as f:
+            json.dump({url: entry for url, entry in self.cache.items() if entry}, f, indent=1)
+
+    def local_names(self, urls):
+        """File name for each URL: the last path segment, disambiguated if two URLs share it"""
+        by_name = {}
+        for url in urls:
+            name = Path(urllib.parse.unquote(urllib.parse.urlsplit(url).path)).name or "download.pdf"
+            by_name.setdefault(name, []).append(url)
+
+        names = {}
+        for name, group in by_name.items():
+            for url in group:
+                if len(group) == 1:
+                    names[url] = name
+                else:
+                    stem, suffix = os.path.splitext(name)
+                    names[url] = f"{stem}-{hashlib.sha1(url.encode('utf-8')).hexdigest()[:8]}{suffix}"
+        return names
+
+    def fetch(self, urls):
+        """Download urls and return the local paths of those available, in list order"""
+        urls = list(dict.fromkeys(urls))
+        self.download_dir.mkdir(parents=True, exist_ok=True)
+        self.load_cache()
+        try:
+            paths = asyncio.run(self.fetch_all(urls))
+        finally:
+            self.save_cache()
+        return [path for path in paths if path is not None]
+
+    async def fetch_all(self, urls):
+        try:
+            import aiohttp
+        except ImportError:
+            raise ImportError("fetching PDFs requires aiohttp (pip install aiohttp)") from None
+
+        names = self.local_names(urls)
+        connector = aiohttp.TCPConnector(limit=self.connections)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=120)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         headers={'User-Agent': 'slideview'}) as session:
+            return await asyncio.gather(*(self.fetch_one(session, url, names[url]) for url in urls))
+
+    async def fetch_one(self, session, url, name):
+        """Download one URL, returning its local path or None if it is unavailable"""
+        import aiohttp
+
+        path = self.download_dir / name
+        part_path = path.with_name(path.name + ".part")
+        entry = self.cache.setdefault(url, {})
+
+        for attempt in range(1, self.retries + 1):
+            headers = {}
+            offset = part_path.stat().st_size if part_path.exists() and entry.get('partial_validator') else 0
+            if offset:
+                headers['Range'] = f"bytes={offset}-"
+                headers['If-Range'] = entry['partial_validator']
+            elif path.exists() and entry.get('file') == name:
+                if entry.get('etag'):
+                    headers['If-None-Match'] = entry['etag']
+                if entry.get('last_modified'):
+                    headers['If-Modified-Since'] = entry['last_modified']
+
+            try:
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 304:
+                        print(f"Unchanged {name}")
+                        return path
+                    if response.status == 416:
+                        # The partial file no longer fits the remote one; start over
+                        part_path.unlink(missing_ok=True)
+                        entry.pop('partial_validator', None)
+                        continue
+                    response.raise_for_status()
+
+                    etag = response.headers.get('ETag')
+                    last_modified = response.headers.get('Last-Modified')
+                    # If-Range only accepts strong validators
+                    entry['partial_validator'] = etag if etag and not etag.startswith('W/') else last_modified
+                    self.save_cache()
+
+                    if response.status == 206:
+                        print(f"Resuming {name} at {offset / 1024:.0f}KB")
+                        mode = 'ab'
+                    else:
+                        mode = 'wb'
+
+                    received = 0
+                    with open(part_path, mode) as f:
+                        async for block in response.content.iter_chunked(1 << 16):
+                            f.write(block)
+                            received += len(block)
+                    if response.content_length is not None and received != response.content_length:
+                        raise aiohttp.ClientPayloadError(
+                            f"received {received} of {response.content_length} bytes")
+
+                os.replace(part_path, path)
+                self.cache[url] = {'file': name, 'etag': etag, 'last_modified': last_modified,
+                                   'size': path.stat().st_size}
+                entry = self.cache[url]
+                print(f"Fetched {name} ({entry['size'] / 1024:.0f}KB)")
+                return path
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                client_error = isinstance(e, aiohttp.ClientResponseError) and 400 <= e.status < 500
+                if attempt == self.retries or client_error:
+                    print(f"Error fetching {url}: {e}")
+                    break
+                await asyncio.sleep(2 ** attempt)
+
+        # Fall back to an earlier complete download, if any
+        return path if path.exists() and entry.get('file') == name else None
+
+
+class PDFWatcher:
+    """Wait for PDFs to be added, changed or removed
+
+    Watches directories for *.pdf files and, for single files, their parent
+    directory. On Linux inotify is used through ctypes, so a change is seen
+    as soon as the writer closes the file or moves it into place; elsewhere,
+    or with poll=True (inotify does not see writes made on another machine
+    to a network share), the directories are scanned every poll_interval
+    seconds. Changes are debounced: wait() returns once no further change
+    has arrived for debounce seconds.
+    """
+
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_DELETE = 0x200
+    IN_Q_OVERFLOW = 0x4000
+    IN_CLOEXEC = 0o2000000
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, paths, debounce=1.0, poll=False, poll_interval=1.0):
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.directories = {}
+        for path in map(Path, paths):
+            if path.is_dir():
+                self.directories[path.resolve()] = None
+            else:
+                names = self.directories.setdefault(path.resolve().parent, set())
+                if names is not None:
+                    names.add(path.name)
+        self.fd = None if poll or not sys.platform.startswith('linux') else self.init_inotify()
+        self.snapshot = self.scan() if self.fd is None else None
+
+    def watched(self, directory, name):
+        """Whether a file in a watched directory is one of the PDFs of interest"""
+        names = self.directories.get(directory)
+        return name in names if names is not None else name.lower().endswith('.pdf')
+
+    def init_inotify(self):
+        """Set up inotify watches, returning the descriptor or None if unavailable"""
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(self.IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_FROM | self.IN_MOVED_TO | self.IN_DELETE
+        self.watches = {}
+        for directory in self.directories:
+            wd = libc.inotify_add_watch(fd, os.fsencode(directory), mask)
+            if wd < 0:
+                print(f"  Could not watch {directory}: {os.strerror(ctypes.get_errno())}, polling instead")
+                os.close(fd)
+                return None
+            self.watches[wd] = directory
+        return fd
+
+    def scan(self):
+        """(mtime_ns, size) of every watched PDF, for polling"""
+        snapshot = {}
+        for directory in self.directories:
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if self.watched(directory, entry.name) and entry.is_file():
+                    stat = entry.stat()
+                    snapshot[Path(directory, entry.name)] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def read_changes(self, timeout):
+        """Changed paths seen within timeout seconds (None blocks), possibly empty"""
+        if self.fd is None:
+            time.sleep(self.poll_interval if timeout is None else min(timeout, self.poll_interval))
+            snapshot = self.scan()
+            changed = {path for path in snapshot.keys() | self.snapshot.keys()
+                       if snapshot.get(path) != self.snapshot.get(path)}
+            self.snapshot = snapshot
+            return changed
+
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return set()
+        data = os.read(self.fd, 64 * 1024)
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & self.IN_Q_OVERFLOW:
+                # Events were lost; report every watched directory as changed
+                changed.update(self.watches.values())
+            elif wd in self.watches and self.watched(self.watches[wd], name):
+                changed.add(self.watches[wd] / name)
+        return changed
+
+    def wait(self):
+        """Block until PDFs changed and things settled; return the changed paths"""
+        changed = set()
+        while not changed:
+            changed = self.read_changes(None)
+        while more := self.read_changes(self.debounce):
+            changed |= more
+        return changed
+
+
+CATALOG_NAME = "catalog.sqlite"
+
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS presentations (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    sha256 TEXT,
+    size INTEGER,
+    mtime_ns INTEGER,
+    pages INTEGER NOT NULL,
+    version TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS slides (
+    id INTEGER PRIMARY KEY,
+    presentation_id INTEGER NOT NULL REFERENCES presentations(id),
+    page INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    image TEXT,
+    thumbnail TEXT,
+    hash TEXT,
+    text TEXT NOT NULL,
+    UNIQUE (presentation_id, page)
+);
+CREATE INDEX IF NOT EXISTS slides_hash ON slides(hash);
+CREATE VIRTUAL TABLE IF NOT EXISTS slide_terms USING fts5(terms);
+"""
+
+
+class SlideCatalog:
+    """SQLite catalog of the presentations and pages of a build, with full-text search
+
+    The catalog follows the build manifest: each build rewrites the rows
+    of the decks whose slides changed and drops those of decks that are
+    gone. slide_terms is an FTS5 table over the same stemmed terms as the
+    viewer's search index, with the rowid of the slide, so a query finds
+    the slides the search box would. Data URIs of single-file builds are
+    not stored.
+    """
+
+    def __init__(self, path, readonly=False):
+        if readonly:
+            self.db = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True)
+        else:
+            self.db = sqlite3.connect(path)
+            self.db.executescript(CATALOG_SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def update(self, presentations):
+        """Bring the catalog in line with manifest entries keyed by source path; return the decks rewritten"""
+        known = dict(self.db.execute("SELECT path, version FROM presentations"))
+        rewritten = 0
+        with self.db:
+            for path, entry in presentations.items():
+                rows = [(slide['page'], *(slide.get('size') or (None, None)),
+                         *(None if asset.startswith('data:') else asset for asset in (slide['image'], slide['thumbnail'])),
+                         slide.get('hash'), slide.get('text', ''))
+                        for slide in entry['slides']]
+                version = hashlib.sha1(repr((entry.get('sha256'), rows)).encode('utf-8')).hexdigest()
+                if known.pop(path, None) == version:
+                    continue
+                self.remove(path)
+                presentation_id = self.db.execute(
+                    "INSERT INTO presentations (path, name, sha256, size, mtime_ns, pages, version) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (path, Path(path).stem, entry.get('sha256'), entry.get('size'), entry.get('mtime_ns'),
+                     len(rows), version)).lastrowid
+                first_id = self.db.execute("SELECT coalesce(max(id), 0) + 1 FROM slides").fetchone()[0]
+                self.db.executemany(
+                    "INSERT INTO slides (id, presentation_id, page, width, height, image, thumbnail, hash, text) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(first_id + i, presentation_id, *row) for i, row in enumerate(rows)])
+                self.db.executemany("INSERT INTO slide_terms (rowid, terms) VALUES (?, ?)",
+                                    [(first_id + i, ' '.join(search_terms(row[-1]))) for i, row in enumerate(rows)])
+                rewritten += 1
+            for path in known:
+                self.remove(path)
+        return rewritten
+
+    def remove(self, path):
+        """Delete a presentation and its slides"""
+        ids = "SELECT s.id FROM slides s JOIN presentations p ON p.id = s.presentation_id WHERE p.path = ?"
+        self.db.execute(f"DELETE FROM slide_terms WHERE rowid IN ({ids})", (path,))
+        self.db.execute(f"DELETE FROM slides WHERE id IN ({ids})", (path,))
+        self.db.execute("DELETE FROM presentations WHERE path = ?", (path,))
+
+    def counts(self):
+        """(presentations, slides) in the catalog"""
+        return self.db.execute("SELECT (SELECT count(*) FROM presentations), (SELECT count(*) FROM slides)").fetchone()
+
+    def search(self, query, limit=20):
+        """Slides matching every word of query, best first, as (path, page, image, thumbnail, text) rows
+
+        As in the viewer, the last word also matches as a prefix.
+        """
+        terms = search_terms(query)
+        if not terms:
+            return []
+        match = ' '.join(f'"{term}"' for term in terms) + '*'
+        return self.db.execute(
+            "SELECT p.path, s.page, s.image, s.thumbnail, s.text FROM slide_terms "
+            "JOIN slides s ON s.id = slide_terms.rowid JOIN presentations p ON p.id = s.presentation_id "
+            "WHERE slide_terms MATCH ? ORDER BY rank, p.path, s.page LIMIT ?", (match, limit)).fetchall()
+
+
+def text_snippet(text, query, width=100):
+    """About width characters of text around the first word of query found in it"""
+    text = ' '.join(text.split())
+    lowered = text.lower()
+    positions = [lowered.find(word) for word in query.lower().split() if word in lowered]
+    # Start at a word boundary a third of the width before the match
+    start = text.rfind(' ', 0, max(0, min(positions, default=0) - width // 3)) + 1
+    snippet = text[start:start + width]
+    return ('...' if start else '') + snippet + ('...' if start + width < len(text) else '')
+
+
+def query_catalog(output_dir, query, limit):
+    """Print the slides of a build's catalog that match a query"""
+    path = Path(output_dir) / CATALOG_NAME
+    if not path.exists():
+        print(f"Error: no {CATALOG_NAME} in {output_dir}; build the viewer there first")
+        sys.exit(1)
+    if not search_terms(query):
+        print("Nothing to search for: the query has only stopwords or single letters")
+        return
+    catalog = SlideCatalog(path, readonly=True)
+    try:
+        started = time.perf_counter()
+        rows = catalog.search(query, limit)
+        elapsed = time.perf_counter() - started
+    except sqlite3.Error as e:
+        print(f"Error: cannot query {path}: {e}")
+        sys.exit(1)
+    finally:
+        catalog.close()
+    for source, page, image, thumbnail, text in rows:
+        print(f"{Path(source).name} page {page}: {image or source}")
+        if text:
+            print(f"    {text_snippet(text, query)}")
+    print(f"{len(rows)} slides{' (limit reached)' if len(rows) == limit else ''} in {elapsed * 1000:.1f} ms")
+
+
+class RenderCache:
+    """Size-bounded LRU cache of rendered images, in memory and on disk
+
+    Entries are (format, bytes) under a key that identifies the source PDF
+    version, page and render settings, so stale entries are never served,
+    they just age out. Disk entries are files named KEY.FORMAT; their mtime
+    is bumped on every hit, so the least recently used order survives a
+    restart.
+    """
+
+    def __init__(self, directory, memory_bytes, disk_bytes):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()
+        self.memory_used = 0
+        self.disk = OrderedDict()
+        self.disk_used = 0
+        self.stats = {'memory': 0, 'disk': 0, 'miss': 0}
+
+        entries = [entry for entry in os.scandir(self.directory)
+                   if entry.is_file() and entry.name.partition('.')[2] in IMAGE_FORMATS]
+        for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime_ns):
+            key, _, fmt = entry.name.partition('.')
+            self.disk[key] = (fmt, entry.stat().st_size)
+            self.disk_used += entry.stat().st_size
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.memory or key in self.disk
+
+    def get(self, key):
+        """Return (format, bytes) for a key, or None"""
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.stats['memory'] += 1
+                return self.memory[key]
+            entry = self.disk.get(key)
+            if entry:
+                self.disk.move_to_end(key)
+
+        if entry:
+            path = self.directory / f"{key}.{entry[0]}"
+            try:
+                data = path.read_bytes()
+                os.utime(path)
+            except FileNotFoundError:
+                with self.lock:
+                    if self.disk.pop(key, None):
+                        self.disk_used -= entry[1]
+            else:
+                with self.lock:
+                    self.stats['disk'] += 1
+                    self._remember(key, (entry[0], data))
+                return entry[0], data
+
+        with self.lock:
+            self.stats['miss'] += 1
+        return None
+
+    def put(self, key, fmt, data):
+        """Store an entry in memory and on disk, evicting the least recently used"""
+        path = self.directory / f"{key}.{fmt}"
+        with atomic_open(path, 'wb') as f:
+            f.write(data)
+
+        evicted = []
+        with self.lock:
+            self._remember(key, (fmt, data))
+            previous = self.disk.pop(key, None)
+            if previous:
+                self.disk_used -= previous[1]
+            self.disk[key] = (fmt, len(data))
+            self.disk_used += len(data)
+            while self.disk_used > self.disk_bytes and len(self.disk) > 1:
+                old_key, (old_fmt, size) = self.disk.popitem(last=False)
+                self.disk_used -= size
+                evicted.append(self.directory / f"{old_key}.{old_fmt}")
+        for old_path in evicted:
+            old_path.unlink(missing_ok=True)
+
+    def _remember(self, key, entry):
+        """Add an entry to the memory cache; the caller holds the lock"""
+        previous = self.memory.pop(key, None)
+        if previous:
+            self.memory_used -= len(previous[1])
+        self.memory[key] = entry
+        self.memory_used += len(entry[1])
+        while self.memory_used > self.memory_bytes and len(self.memory) > 1:
+            _, (_, data) = self.memory.popitem(last=False)
+            self.memory_used -= len(data)
+
+
+class RenderError(Exception):
+    """A page of a readable deck could not be rendered"""
+
+
+class SlideServer:
+    """Serve the lazy viewer and render slides only when they are requested
+
+    Nothing is rendered up front: the page lists the presentations with
+    their page counts (from pdfinfo, cached on disk per file version) and
+    pages and thumbnails are rendered by a thread pool on first request.
+    Concurrent requests for the same image share one render. Results are
+    kept in a RenderCache in OUTPUT/cache, so a restarted server serves
+    what it rendered before without touching the PDFs again.
+    """
+
+    def __init__(self, viewer, pdf_paths, memory_bytes=256 << 20, disk_bytes=2 << 30):
+        self.viewer = viewer
+        self.decks = list(dict.fromkeys(Path(p) for p in pdf_paths))
+        self.cache = RenderCache(viewer.output_dir / "cache", memory_bytes, disk_bytes)
+        self.executor = ThreadPoolExecutor(max_workers=viewer.jobs)
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self.info_path = self.cache.directory / "decks.json"
+        try:
+            self.info = json.loads(self.info_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            self.info = {}
+        self.settings = json.dumps(viewer.render_settings(), sort_keys=True)
+        self.search_index = None
+        self.unreadable = set()
+        self.renders = 0
+
+    def submit(self, key, function, *args):
+        """Run function(*args) on the pool, once for concurrent callers with the same key
+
+        Returns the future of the call already in flight, if any. Only call
+        this from request threads: pool threads waiting on the pool could
+        deadlock it.
+        """
+        with self.lock:
+            future = self.inflight.get(key)
+            submitted = future is None
+            if submitted:
+                future = self.executor.submit(function, *args)
+                self.inflight[key] = future
+        if submitted:
+            # Outside the lock: a call that is already done runs the callback right here
+            future.add_done_callback(lambda _: self._forget(key))
+        return future
+
+    def _forget(self, key):
+        with self.lock:
+            self.inflight.pop(key, None)
+
+    def deck_info(self, number):
+        """Cached page count and text of a deck, refreshed when the file changes
+
+        Raises LookupError for a deck that is gone or cannot be read.
+        """
+        pdf_path = self.decks[number]
+        key = str(pdf_path.resolve())
+        try:
+            stat = pdf_path.stat()
+        except OSError as e:
+            raise LookupError(f"{type(e).__name__}: {e}") from e
+        version = [stat.st_size, stat.st_mtime_ns]
+        with self.lock:
+            info = self.info.get(key)
+        if info and info['version'] == version:
+            return info
+
+        try:
+            pages = self.viewer.renderer.page_count(pdf_path)
+        except Exception as e:
+            raise LookupError(f"{type(e).__name__}: {e}") from e
+        info = {'version': version, 'pages': pages}
+        with self.lock:
+            self.info[key] = info
+        return info
+
+    def deck_number(self, text):
+        """Parse a deck number from a URL, raising IndexError for unknown decks"""
+        number = int(text)
+        if not 0 <= number < len(self.decks):
+            raise IndexError(number)
+        return number
+
+    def deck_text(self, number):
+        """Text of every page of a deck, extracted once per file version"""
+        info = self.deck_info(number)
+        if 'text' not in info:
+            texts = self.viewer.extract_page_text(self.decks[number]) if self.viewer.extract_text else {}
+            info['text'] = [texts.get(page, '') for page in range(1, info['pages'] + 1)]
+        return info['text']
+
+    def save_info(self):
+        """Persist page counts and texts next to the render cache"""
+        with self.lock:
+            content = json.dumps(self.info, ensure_ascii=False, separators=(',', ':'))
+        with atomic_open(self.info_path) as f:
+            f.write(content)
+
+    def deck_version(self, number):
+        """Short hash identifying a deck's file version and the render settings"""
+        info = self.deck_info(number)
+        key = f"{self.decks[number].resolve()}:{info['version']}:{self.settings}"
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+    def presentation_index(self):
+        """Name, page count and chunk URL of every deck, in order
+
+        Unreadable decks are listed with no slides, so that positions in
+        the index stay equal to deck numbers.
+        """
+        futures = [self.submit(('info', number), self.deck_info, number) for number in range(len(self.decks))]
+        index = []
+        for number, future in enumerate(futures):
+            name = self.decks[number].stem
+            try:
+                count = future.result()['pages']
+            except Exception as e:
+                if number not in self.unreadable:
+                    self.unreadable.add(number)
+                    print(f"Skipping {self.decks[number].name}: {e}")
+                index.append({'name': name, 'count': 0, 'chunk': ''})
+                continue
+            self.unreadable.discard(number)
+            index.append({'name': name, 'count': count, 'chunk': f"chunks/{number}.js?v={self.deck_version(number)}"})
+        self.save_info()
+        return index
+
+    def page_html(self):
+        """The viewer page, listing the decks without rendering anything"""
+        index = self.presentation_index()
+        version = hashlib.sha1(''.join(entry['chunk'] for entry in index).encode('utf-8')).hexdigest()[:10]
+        f = StringIO()
+        self.viewer.write_lazy_viewer(f, index, f"search-index.js?v={version}")
+        return f.getvalue().encode('utf-8')
+
+    def chunk_script(self, number):
+        """Slide entries of one deck for the viewer"""
+        info = self.deck_info(number)
+        version = self.deck_version(number)
+        name = self.decks[number].stem
+        entries = [{'page': page, 'image': f"images/{number}/{page}?v={version}",
+                    'thumbnail': f"thumbnails/{number}/{page}?v={version}", 'id': f"{name}_page_{page}"}
+                   for page in range(1, info['pages'] + 1)]
+        return f"slideviewChunk({number},{json.dumps(entries, separators=(',', ':'))});\n".encode('utf-8')
+
+    def search_script(self):
+        """Search index over the text of all decks, built on first use"""
+        index = self.presentation_index()
+        versions = [entry['chunk'] for entry in index]
+        if self.search_index is None or self.search_index[0] != versions:
+            numbers = [number for number, entry in enumerate(index) if entry['count']]
+            slides = [{'text': text} for deck in self.executor.map(self.deck_text, numbers) for text in deck]
+            search_json = json.dumps(build_search_index(slides), ensure_ascii=False, separators=(',', ':'))
+            self.search_index = (versions, f"slideviewSearchIndex({search_json});\n".encode('utf-8'))
+            self.save_info()
+        return self.search_index[1]
+
+    def image(self, number, page, kind):
+        """(format, bytes) of a page image or thumbnail, rendered if not cached
+
+        Raises LookupError for a deck that cannot be read or a page it does
+        not have, and RenderError if rendering the page fails.
+        """
+        if not 1 <= page <= self.deck_info(number)['pages']:
+            raise IndexError(page)
+        key = hashlib.sha1(f"{self.deck_version(number)}:{page}:{kind}".encode('utf-8')).hexdigest()
+        try:
+            return self.cache.get(key) or self.submit(key, self.render, key, number, page, kind).result()
+        except LookupError:
+            raise
+        except Exception as e:
+            raise RenderError(f"{self.decks[number].name} page {page}: {type(e).__name__}: {e}") from e
+
+    def render(self, key, number, page, kind):
+        """Render one page or thumbnail and store it in the cache"""
+        if key in self.cache:
+            return self.cache.get(key)
+        pages = self.viewer.iter_pages
+        if kind == 'thumbnail' and self.viewer.width:
+            pages = self.viewer.iter_thumbnails
+        for _, image in pages(self.decks[number], page, page):
+            if kind == 'thumbnail':
+                image.thumbnail(self.viewer.thumbnail_size, Image.Resampling.LANCZOS)
+            data, fmt = self.viewer.encode_image(image)
+            break
+        else:
+            # The deck changed under us or the renderer gave up on the page
+            raise IndexError(page)
+        self.cache.put(key, fmt, data)
+        with self.lock:
+            self.renders += 1
+        return fmt, data
+
+    def serve(self, host, port):
+        """Serve until interrupted"""
+        server = ThreadingHTTPServer((host, port), SlideRequestHandler)
+        server.daemon_threads = True
+        server.slides = self
+        # Look up page counts in the background so the first page view is quick
+        threading.Thread(target=self.presentation_index, daemon=True).start()
+        print(f"Serving {len(self.decks)} PDFs on http://{host}:{server.server_address[1]}/ (Ctrl-C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\nStopping server")
+        finally:
+            server.server_close()
+            self.executor.shutdown(cancel_futures=True)
+            stats = self.cache.stats
+            print(f"Cache: {stats['memory']} memory hits, {stats['disk']} disk hits, {stats['miss']} misses, "
+                  f"{self.renders} renders")
+
+
+class SlideRequestHandler(BaseHTTPRequestHandler):
+    """HTTP front end of a SlideServer"""
+
+    server_version = "slideview"
+
+    def do_GET(self):
+        slides = self.server.slides
+        parts = urllib.parse.urlsplit(self.path).path.strip('/').split('/')
+        try:
+            if parts in ([''], ['index.html']):
+                self.send_body(slides.page_html(), 'text/html; charset=utf-8', cache=False)
+            elif parts == ['search-index.js']:
+                self.send_body(slides.search_script(), 'text/javascript; charset=utf-8')
+            elif len(parts) == 2 and parts[0] == 'chunks' and parts[1].endswith('.js'):
+                self.send_body(slides.chunk_script(slides.deck_number(parts[1][:-3])), 'text/javascript; charset=utf-8')
+            elif len(parts) == 3 and parts[0] in ('images', 'thumbnails'):
+                number, page = slides.deck_number(parts[1]), int(parts[2])
+                fmt, data = slides.image(number, page, parts[0][:-1])
+                self.send_body(data, IMAGE_FORMATS[fmt][1])
+            else:
+                self.send_error(404)
+        except (ValueError, LookupError, FileNotFoundError):
+            self.send_error(404)
+        except RenderError as e:
+            print(f"Error rendering {self.path}: {e}")
+            self.send_error(502, "Rendering failed")
+        except Exception as e:
+            print(f"Error serving {self.path}: {e}")
+            self.send_error(500)
+
+    def send_body(self, data, content_type, cache=True):
+        """Send a complete response; versioned URLs may be cached for good"""
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Cache-Control', 'public, max-age=31536000, immutable' if cache else 'no-cache')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_request(self, code='-', size='-'):
+        # Only failures are worth a line; a page view requests dozens of images
+        if isinstance(code, int) and code >= 400:
+            super().log_request(code, size)
+
+
+def collect_pdf_files(paths):
+    """PDF files named on the command line, with directories expanded"""
+    pdf_files = []
+    for path_arg in paths:
+        path = Path(path_arg)
+        if path.is_file() and path.suffix.lower() == '.pdf':
+            pdf_files.append(path)
+        elif path.is_dir():
+            pdf_files.extend(sorted(path.glob('*.pdf')))
+            pdf_files.extend(sorted(path.glob('*.PDF')))
+        else:
+            print(f"Warning: {path} is not a valid PDF file or directory")
+    return pdf_files
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert PDFs to a browsable slide viewer')
+    parser.add_argument('pdfs', nargs='*', help='PDF files or directory containing PDFs')
+    parser.add_argument('--output', '-o', default='slide_viewer', help='Output directory (default: slide_viewer)')
+    parser.add_argument('--thumbnail-size', default='300x200', help='Thumbnail size as WIDTHxHEIGHT (default: 300x200)')
+    parser.add_argument('--quality', type=int, default=85, help='Image quality 1-100 for lossy formats (default: 85)')
+    parser.add_argument('--format', choices=[*IMAGE_FORMATS, 'auto'], default='png', dest='image_format',
+                        help='Image format; png8 is palette-quantized PNG, auto picks the smallest per image (default: png)')
+    parser.add_argument('--min-psnr', type=float, default=40.0, help='Quality budget for --format auto in dB PSNR (default: 40)')
+    parser.add_argument('--single-file', action='store_true', help='Create a single HTML file with embedded images (larger file, easier to share)')
+    parser.add_argument('--dpi', type=int, default=150, help='Render resolution (default: 150)')
+    parser.add_argument('--preview', action='store_true',
+                        help='Publish a complete viewer from fast low-resolution renders first, '
+                             'then replace its images at full quality in place')
+    parser.add_argument('--preview-dpi', type=int, default=50, help='Render resolution of the --preview pass (default: 50)')
+    parser.add_argument('--width', type=int, metavar='PX',
+                        help='Render every page PX pixels wide, choosing the resolution per page from its size, '
+                             'and render thumbnails directly at thumbnail size (overrides --dpi)')
+    parser.add_argument('--srcset', metavar='WIDTHS',
+                        help='Also store each page scaled down to these comma-separated pixel widths (e.g. 640,1280); '
+                             'the viewer shows the smallest that fills the screen and prefetches neighbouring slides')
+    parser.add_argument('--timeout', type=float, metavar='SECONDS',
+                        help='Convert every PDF in a process of its own and quarantine those not done within SECONDS')
+    parser.add_argument('--memory-limit', type=int, metavar='MB',
+                        help='Convert every PDF in a process of its own, with its address space (renderer included) '
+                             'limited to MB megabytes; PDFs that fail are quarantined')
+    parser.add_argument('--retry-quarantined', action='store_true',
+                        help=f'Try the PDFs listed in {QUARANTINE_NAME} again even if they have not changed')
+    parser.add_argument('--no-cache', action='store_true', help='Re-render all PDFs even if the build manifest says they are unchanged')
+    parser.add_argument('--renderer', choices=RENDERERS, default='pdftoppm',
+                        help='Page renderer and text extractor: pdftoppm and pdftotext subprocesses (poppler) or in-process pdfium '
+                             '(needs pypdfium2) (default: pdftoppm)')
+    parser.add_argument('--render-threads', type=int, default=2, help='Pages the pdfium renderer renders ahead of thumbnailing and encoding (default: 2)')
+    parser.add_argument('--thumbnail-workers', type=int, default=1, help='Threads per process making thumbnails (default: 1)')
+    parser.add_argument('--encode-workers', type=int, default=1, help='Threads per process encoding and writing images (default: 1)')
+    parser.add_argument('--queue-depth', type=int, default=2, help='Pages buffered between pipeline stages; bounds memory per process (default: 2)')
+    parser.add_argument('--stream', action='store_true', help='Render pages in bounded chunks through temporary files to keep memory flat on long decks')
+    parser.add_argument('--stream-chunk', type=int, default=8, help='Pages rendered per pdftoppm call in --stream mode (default: 8)')
+    parser.add_argument('--dedup', action='store_true',
+                        help='Store identical pages once, across all decks, and name image files by content')
+    parser.add_argument('--dedup-distance', type=int, default=0, metavar='BITS',
+                        help='With --dedup, also share near-identical pages: those whose perceptual hashes differ in at most '
+                             'BITS of 256 bits and whose thumbnails match closely (try 8) (default: 0, identical pixels only)')
+    parser.add_argument('--no-text', action='store_true', help='Do not extract slide text for full-text search')
+    parser.add_argument('--no-placeholders', action='store_true',
+                        help='Do not inline a tiny blurred preview into every card to show until its thumbnail loads')
+    parser.add_argument('--lazy', action='store_true', help='Write a small bootstrap page that loads slides per presentation on demand (for very large libraries)')
+    parser.add_argument('--sprites', action='store_true', help='Pack thumbnails into a few atlas images per presentation instead of one file per slide')
+    parser.add_argument('--jobs', '-j', type=int, help='Number of worker processes (render threads with --serve), 0 for one per CPU (default: 1, one per CPU with --serve)')
+    parser.add_argument('--fetch', metavar='URL_LIST', help='Download the PDF URLs listed in this file (- for stdin) and include them')
+    parser.add_argument('--download-dir', default='pdfs', help='Directory for --fetch downloads (default: pdfs)')
+    parser.add_argument('--connections', type=int, default=8, help='Concurrent connections for --fetch (default: 8)')
+    parser.add_argument('--watch', action='store_true', help='Keep running and rebuild when PDFs are added, changed or removed')
+    parser.add_argument('--debounce', type=float, default=1.0, help='Seconds without further changes before --watch rebuilds (default: 1)')
+    parser.add_argument('--poll', action='store_true', help='Make --watch scan for changes instead of using inotify (for network shares)')
+    parser.add_argument('--serve', action='store_true', help='Serve the viewer over HTTP and render slides on first request instead of up front')
+    parser.add_argument('--host', default='127.0.0.1', help='Address for --serve to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8000, help='Port for --serve, 0 picks a free one (default: 8000)')
+    parser.add_argument('--cache-mb', type=int, default=256, help='In-memory image cache of --serve in MB (default: 256)')
+    parser.add_argument('--disk-cache-mb', type=int, default=2048, help='On-disk image cache of --serve in OUTPUT/cache, in MB (default: 2048)')
+    parser.add_argument('--shard', metavar='I/N', help='Render only shard I of N of the PDFs (chosen by file name) and skip index.html; combine with --merge')
+    parser.add_argument('--merge', nargs='+', metavar='SHARD_DIR', help='Write index.html in OUTPUT from the outputs of --shard runs, without rendering')
+    parser.add_argument('--query', metavar='TEXT',
+                        help=f'Search the slide text in OUTPUT/{CATALOG_NAME}, kept up to date by every build, and print the matching slides')
+    parser.add_argument('--query-limit', type=int, default=20, help='Slides printed by --query (default: 20)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Time every stage per deck and page, write a Chrome trace and print the slowest')
+    parser.add_argument('--trace', metavar='PATH', help='Where --profile writes its Chrome trace (default: OUTPUT/trace.json)')
+    parser.add_argument('--profile-top', type=int, default=10, help='Decks and pages listed by --profile (default: 10)')
+
+    args = parser.parse_args()
+
+    if args.query is not None:
+        query_catalog(args.output, args.query, max(1, args.query_limit))
+        return
+
+    if not args.pdfs and not args.fetch and not args.merge:
+        parser.error("give PDF files or directories, or --fetch URL_LIST, --merge SHARD_DIR... or --query TEXT")
+
+    shard = None
+    if args.shard:
+        try:
+            shard = tuple(map(int, args.shard.split('/')))
+            if len(shard) != 2 or not 1 <= shard[0] <= shard[1]:
+                raise ValueError(args.shard)
+        except ValueError:
+            print("Error: --shard must be given as I/N with 1 <= I <= N (e.g., 2/8)")
+            sys.exit(1)
+        if args.serve or args.watch or args.merge:
+            print("Error: --shard cannot be combined with --serve, --watch or --merge")
+            sys.exit(1)
+
+    # Parse thumbnail size
+    try:
+        width, height = map(int, args.thumbnail_size.split('x'))
+        thumbnail_size = (width, height)
+    except ValueError:
+        print("Error: thumbnail-size must be in format WIDTHxHEIGHT (e.g., 300x200)")
+        sys.exit(1)
+
+    if not format_available(args.image_format if args.image_format != 'auto' else 'png'):
+        print(f"Error: this Pillow build cannot write {args.image_format.upper()} (try pip install pillow-avif-plugin)")
+        sys.exit(1)
+
+    if args.width is not None and args.width < 1:
+        print("Error: --width must be a positive number of pixels")
+        sys.exit(1)
+
+    # Parse srcset widths
+    try:
+        srcset = [int(width) for width in args.srcset.split(',')] if args.srcset else []
+    except ValueError:
+        print("Error: --srcset must be comma-separated pixel widths (e.g., 640,1280)")
+        sys.exit(1)
+    if any(width < 1 for width in srcset):
+        print("Error: --srcset widths must be positive numbers of pixels")
+        sys.exit(1)
+    if srcset and args.single_file:
+        print("Error: --srcset stores extra image files and cannot be combined with --single-file")
+        sys.exit(1)
+
+    if not 0 <= args.dedup_distance <= 64:
+        print("Error: --dedup-distance must be between 0 and 64 bits")
+        sys.exit(1)
+
+    if (args.timeout is not None and args.timeout <= 0) or (args.memory_limit is not None and args.memory_limit < 1):
+        print("Error: --timeout and --memory-limit must be positive")
+        sys.exit(1)
+
+    if args.lazy and args.single_file:
+        print("Error: --lazy and --single-file cannot be combined")
+        sys.exit(1)
+
+    if args.renderer == 'pdfium':
+        try:
+            import pypdfium2  # noqa: F401
+        except ImportError:
+            print("Error: --renderer pdfium requires pypdfium2 (pip install pypdfium2)")
+            sys.exit(1)
+
+    if args.sprites and args.single_file:
+        print("Error: --sprites needs multi-file output and cannot be combined with --single-file")
+        sys.exit(1)
+
+    if args.trace and not args.profile:
+        print("Error: --trace names the trace file of --profile")
+        sys.exit(1)
+
+    if args.preview and (args.serve or args.merge or shard):
+        print("Error: --preview cannot be combined with --serve, --merge or --shard")
+        sys.exit(1)
+
+    if args.serve and (args.single_file or args.watch):
+        print("Error: --serve cannot be combined with --single-file or --watch")
+        sys.exit(1)
+
+    if args.serve and (args.timeout or args.memory_limit):
+        print("Error: --timeout and --memory-limit limit build processes and cannot be combined with --serve")
+        sys.exit(1)
+
+    if args.jobs is None:
+        args.jobs = 0 if args.serve else 1
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
 
     # Create viewer
     viewer = PDFSlideViewer(
         output_dir=args.output,
         thumbnail_size=thumbnail_size,
         quality=args.quality,
-        single_file=args.single_file
+        single_file=args.single_file,
+        jobs=jobs,
+        stream=args.stream,
+        stream_chunk=max(1, args.stream_chunk),
+        dpi=args.dpi,
+        use_cache=not args.no_cache,
+        image_format=args.image_format,
+        min_psnr=args.min_psnr,
+        lazy=args.lazy,
+        extract_text=not args.no_text,
+        placeholders=not args.no_placeholders,
+        timeout=args.timeout,
+        memory_limit=args.memory_limit,
+        retry_quarantined=args.retry_quarantined,
+        profile=args.profile,
+        sprites=args.sprites,
+        renderer=args.renderer,
+        render_threads=max(1, args.render_threads),
+        thumbnail_workers=max(1, args.thumbnail_workers),
+        encode_workers=max(1, args.encode_workers),
+        queue_depth=max(1, args.queue_depth),
+        width=args.width,
+        srcset=srcset,
+        dedup=args.dedup_distance if args.dedup else None
     )
 
-    # Process PDFs
-    viewer.process_pdfs(pdf_files)
+    if args.merge:
+        viewer.merge_shards(args.merge)
+        if not viewer.slides_data:
+            print("No slides to merge!")
+            sys.exit(1)
+        viewer.generate_html_viewer()
+        return
+
+    # Collect PDF files
+    pdf_files = collect_pdf_files(args.pdfs)
+
+    fetched = []
+    if args.fetch:
+        fetcher = PDFFetcher(args.download_dir, connections=max(1, args.connections))
+        try:
+            urls = read_url_list(args.fetch)
+            print(f"Fetching {len(urls)} URLs into {args.download_dir}/")
+            fetched = fetcher.fetch(urls)
+            pdf_files.extend(fetched)
+        except (ImportError, OSError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+    if not pdf_files and not args.watch:
+        print("No PDF files found!")
+        sys.exit(1)
+
+    print(f"Found {len(pdf_files)} PDF files")
+
+    if shard:
+        total = len(pdf_files)
+        pdf_files = viewer.select_shard(pdf_files, *shard)
+        print(f"Shard {shard[0]}/{shard[1]}: {len(pdf_files)} of {total} PDFs")
+
+    if args.serve:
+        server = SlideServer(viewer, pdf_files, memory_bytes=args.cache_mb << 20, disk_bytes=args.disk_cache_mb << 20)
+        try:
+            server.serve(args.host, args.port)
+        except OSError as e:
+            print(f"Error: cannot listen on {args.host}:{args.port}: {e}")
+            sys.exit(1)
+        return
+
+    # Process PDFs; process_pdfs() saves the finished decks when interrupted
+    try:
+        if args.preview:
+            started = time.perf_counter()
+            preview = viewer.preview_viewer(max(1, args.preview_dpi))
+            preview.process_pdfs(pdf_files)
+            if preview.slides_data:
+                preview.generate_html_viewer()
+                print(f"\nPreview ready in {time.perf_counter() - started:.1f}s; replacing it at full quality")
+
+        viewer.process_pdfs(pdf_files)
+    except KeyboardInterrupt:
+        sys.exit(130)
 
     # Generate HTML viewer
-    if viewer.slides_data:
+    if shard:
+        viewer.remove_stale_assets()
+        print(f"\nShard {shard[0]}/{shard[1]} written to {args.output}; build index.html with --merge")
+    elif viewer.slides_data:
         viewer.generate_html_viewer()
     else:
         print("No slides were processed successfully!")
 
+    if args.profile:
+        trace_path = Path(args.trace or Path(args.output) / "trace.json")
+        viewer.tracer.write(trace_path)
+        viewer.tracer.print_summary(max(1, args.profile_top))
+        print(f"\nTrace written to {trace_path} (open in chrome://tracing or ui.perfetto.dev)")
+
+    if args.watch:
+        watcher = PDFWatcher(args.pdfs + fetched, debounce=max(0.0, args.debounce), poll=args.poll)
+        method = "polling" if watcher.fd is None else "inotify"
+        print(f"\nWatching {len(watcher.directories)} directories ({method}), press Ctrl-C to stop")
+        # Later rebuilds reuse what is already rendered, even with --no-cache
+        viewer.use_cache = True
+        try:
+            while True:
+                changed = watcher.wait()
+                started = time.perf_counter()
+                print(f"\nChanged: {', '.join(sorted(path.name for path in changed))}")
+                pdf_files = collect_pdf_files(args.pdfs) + [path for path in fetched if path.exists()]
+                viewer.rebuild(pdf_files, changed)
+                print(f"Rebuilt in {time.perf_counter() - started:.1f}s")
+        except KeyboardInterrupt:
+            print("\nStopped watching")
+
 if __name__ == "__main__":
     main()
 
@@ -0,0 +1,129 @@
+"""
+Tests of PDFFetcher against a local stub HTTP server
+
+The stub serves one PDF with an ETag and answers conditional requests with
+304 and Range requests guarded by If-Range with 206, like a well-behaved
+web server. Run with:
+    python -m unittest scripts/test_fetch.py
+"""
+
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from slideview import PDFFetcher  # noqa: E402
+
+try:
+    import aiohttp  # noqa: F401
+except ImportError:
+    aiohttp = None
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serves server.body at /deck.pdf, with server.etag as its validator"""
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        if self.path != '/deck.pdf':
+            self.send_error(404)
+            return
+        body = server.body
+        if self.headers.get('If-None-Match') == server.etag:
+            self.send_response(304)
+            self.send_header('ETag', server.etag)
+            self.end_headers()
+            return
+        start = 0
+        if_range = self.headers.get('If-Range')
+        if self.headers.get('Range') and (if_range is None or if_range == server.etag):
+            start = int(self.headers['Range'].removeprefix('bytes=').split('-')[0])
+        self.send_response(206 if start else 200)
+        self.send_header('ETag', server.etag)
+        self.send_header('Content-Length', str(len(body) - start))
+        if start:
+            self.send_header('Content-Range', f"bytes {start}-{len(body) - 1}/{len(body)}")
+        self.end_headers()
+        if server.truncate:
+            # Drop the connection half way, once
+            server.truncate = False
+            self.wfile.write(body[start:start + (len(body) - start) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(body[start:])
+
+    def log_message(self, format, *args):
+        pass
+
+
+@unittest.skipIf(aiohttp is None, "PDFFetcher needs aiohttp")
+class PDFFetcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.body = b"%PDF-1.4\n" + bytes(range(256)) * 400
+        self.server.etag = '"v1"'
+        self.server.truncate = False
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/deck.pdf"
+        self.tmp = tempfile.TemporaryDirectory()
+        self.download_dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def fetch(self):
+        paths = PDFFetcher(self.download_dir, retries=2).fetch([self.url])
+        self.assertEqual(len(paths), 1)
+        return paths[0]
+
+    def test_download_and_revalidate(self):
+        path = self.fetch()
+        self.assertEqual(path.read_bytes(), self.server.body)
+        self.assertNotIn('If-None-Match', self.server.requests[-1])
+
+        # Unchanged: a conditional request, answered with 304
+        mtime = path.stat().st_mtime_ns
+        self.assertEqual(self.fetch(), path)
+        self.assertEqual(self.server.requests[-1].get('If-None-Match'), '"v1"')
+        self.assertEqual(path.stat().st_mtime_ns, mtime)
+
+        # Changed: the new version replaces the old one
+        self.server.body = b"%PDF-1.4\nchanged"
+        self.server.etag = '"v2"'
+        self.assertEqual(self.fetch().read_bytes(), self.server.body)
+
+    def test_resume_interrupted_download(self):
+        self.server.truncate = True
+        path = self.fetch()
+        self.assertEqual(path.read_bytes(), self.server.body)
+        self.assertEqual(len(self.server.requests), 2)
+        resumed = self.server.requests[1]
+        self.assertEqual(resumed.get('If-Range'), '"v1"')
+        self.assertEqual(resumed.get('Range'), f"bytes={len(self.server.body) // 2}-")
+        self.assertFalse(path.with_name(path.name + ".part").exists())
+
+    def test_resume_after_remote_change_starts_over(self):
+        self.server.truncate = True
+        fetcher = PDFFetcher(self.download_dir, retries=1)
+        self.assertEqual(fetcher.fetch([self.url]), [])
+        self.assertTrue((self.download_dir / "deck.pdf.part").exists())
+
+        # If-Range no longer matches, so the server sends the whole new file
+        self.server.body = b"%PDF-1.4\n" + b"new" * 1000
+        self.server.etag = '"v2"'
+        path = self.fetch()
+        self.assertEqual(self.server.requests[-1].get('If-Range'), '"v1"')
+        self.assertEqual(path.read_bytes(), self.server.body)
+
+
+if __name__ == '__main__':
+    unittest.main()